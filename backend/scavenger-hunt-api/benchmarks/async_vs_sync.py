@@ -0,0 +1,177 @@
+"""Idle admin streams and hot-read latency, sync (threaded WSGI) vs ASGI.
+
+For each serving mode this starts the API in a subprocess against a fresh
+SQLite file, opens --streams idle admin SSE connections, then drives
+GET /api/hunt/current-step from --concurrency clients for --seconds while
+the streams stay open. It reports how many streams the server accepted,
+request throughput and p50/p99 latency, and the server's thread count and
+RSS while loaded.
+
+The async mode needs the optional packages: pip install uvicorn aiosqlite
+
+    python benchmarks/async_vs_sync.py --streams 1000 --concurrency 32 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'sync': [sys.executable, '-c',
+             'import sys; from src.main import app; '
+             'app.run(host="127.0.0.1", port=int(sys.argv[1]), threaded=True)'],
+    'async': [sys.executable, '-m', 'uvicorn', 'src.asgi:app', '--host', '127.0.0.1',
+              '--log-level', 'warning', '--backlog', '4096', '--port']
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(mode, port, database_path):
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{database_path}')
+    process = subprocess.Popen(SERVERS[mode] + [str(port)], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode} server exited with {process.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+def post_json(port, path, body):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+def server_stats(pid):
+    stats = {}
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            name, _, value = line.partition(':')
+            if name in ('Threads', 'VmRSS'):
+                stats[name] = int(value.split()[0])
+    return stats
+
+async def open_stream(port, token):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write((f'GET /api/admin/notifications/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                  f'Authorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n').encode())
+    await writer.drain()
+    return reader, writer
+
+async def is_held(reader):
+    # A held stream has either sent 200 headers or nothing yet (the threaded
+    # server only sends headers with the first event or heartbeat)
+    try:
+        data = await asyncio.wait_for(reader.read(64), 0.5)
+    except asyncio.TimeoutError:
+        return True
+    return data.startswith(b'HTTP/1.1 200') or data.startswith(b'HTTP/1.0 200')
+
+async def get(port, path, token):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write((f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n'
+                      f'Connection: close\r\n\r\n').encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    if b' 200 ' not in response.split(b'\r\n', 1)[0]:
+        raise ConnectionError(response[:80])
+    return time.perf_counter() - started
+
+async def load(port, admin_token, user_tokens, streams, concurrency, seconds, pid):
+    opened = await asyncio.gather(*(asyncio.wait_for(open_stream(port, admin_token), 30) for _ in range(streams)),
+                                  return_exceptions=True)
+    opened = [stream for stream in opened if not isinstance(stream, BaseException)]
+    await asyncio.sleep(1)
+    held = sum(await asyncio.gather(*(is_held(reader) for reader, _ in opened)))
+    
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    
+    async def client(index):
+        nonlocal errors
+        sent = 0
+        while time.monotonic() < deadline:
+            token = user_tokens[(index + sent) % len(user_tokens)]
+            sent += 1
+            try:
+                latencies.append(await asyncio.wait_for(get(port, '/api/hunt/current-step', token), 30))
+            except (OSError, asyncio.TimeoutError):
+                errors += 1
+    
+    started = time.monotonic()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.monotonic() - started
+    stats = server_stats(pid)
+    
+    for _, writer in opened:
+        writer.close()
+    latencies.sort()
+    
+    def percentile(p):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return {
+        'streams': held,
+        'requests_per_sec': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+        'errors': errors,
+        'threads': stats.get('Threads', 0),
+        'rss_mb': stats.get('VmRSS', 0) / 1024
+    }
+
+def run(mode, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        process = start_server(mode, port, os.path.join(tmp, 'bench.db'))
+        try:
+            admin_token = post_json(port, '/api/auth/admin-login', {'username': 'admin', 'password': 'admin123'})['token']
+            user_tokens = [post_json(port, '/api/auth/login', {'email': f'bench{i}@example.com'})['token']
+                           for i in range(args.users)]
+            return asyncio.run(load(port, admin_token, user_tokens, args.streams,
+                                    args.concurrency, args.seconds, process.pid))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streams', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--modes', default='sync,async')
+    args = parser.parse_args()
+    
+    print(f'{args.streams} idle streams, {args.concurrency} clients, {args.seconds:g}s per mode')
+    print(f"{'mode':<8}{'streams':>9}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'threads':>9}{'RSS MB':>9}")
+    for mode in args.modes.split(','):
+        result = run(mode, args)
+        print(f"{mode:<8}{result['streams']:>9}{result['requests_per_sec']:>9.0f}{result['p50_ms']:>9.2f}"
+              f"{result['p99_ms']:>9.2f}{result['errors']:>8}{result['threads']:>9}{result['rss_mb']:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""Hunt-weekend load test: player and admin traffic against src.main:app.
+
+The app runs in this process against a fresh SQLite file (or the database in
+--database-url, e.g. a pooled PostgreSQL/MySQL server configured with the
+usual DB_POOL_* variables). Requests go straight to the WSGI app through
+Flask's test client, one per worker thread, so results measure the app and
+database rather than the HTTP server.
+
+1. Login storm: --players players log in from --concurrency threads.
+2. Hunt: for --seconds, --concurrency player threads poll current-step and
+   progress (revalidating with If-None-Match, as browsers do), reveal
+   locations and scan correct and wrong QR codes, while --admins dashboard
+   threads poll /api/admin/stats, /users and /events every --admin-interval
+   seconds.
+
+Keep --concurrency plus --admins within the connection pool (15 for SQLite,
+DB_POOL_SIZE + DB_MAX_OVERFLOW otherwise), or the run mostly measures
+requests queueing for a connection.
+
+Per endpoint it reports throughput, p50/p95/p99 latency, errors and SQL
+statements per request. --save-baseline stores the result as JSON in
+benchmarks/baselines/<name>.json; --compare checks a run against it and exits
+with status 1 when an endpoint's p95 latency or throughput moved by more
+than --tolerance, or its statements per request or error rate went up.
+Latency baselines are only meaningful on the machine that recorded them;
+statement counts carry over.
+
+    python benchmarks/hunt_weekend.py --save-baseline
+    python benchmarks/hunt_weekend.py --compare
+    DB_POOL_SIZE=20 python benchmarks/hunt_weekend.py --database-url postgresql://... --concurrency 16
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+sys.path.insert(0, ROOT)
+
+# Relative weights of player actions during the hunt phase
+PLAYER_MIX = (
+    ('current-step', 50),
+    ('progress', 15),
+    ('scan-correct', 12),
+    ('scan-wrong', 15),
+    ('reveal', 8)
+)
+
+ADMIN_ENDPOINTS = ('/api/admin/stats', '/api/admin/users?limit=50', '/api/admin/events?limit=50')
+
+# Regression checks skip what is noise on any machine: latency changes under
+# LATENCY_FLOOR_MS, latency and throughput of endpoints with fewer than
+# MIN_SAMPLES requests, and error rates within ERROR_RATE_MARGIN
+LATENCY_FLOOR_MS = 1.0
+MIN_SAMPLES = 50
+ERROR_RATE_MARGIN = 0.005
+
+class Recorder:
+    # Client-side latencies per endpoint, plus SQL statements attributed to
+    # the endpoint whose request issued them
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.latencies = defaultdict(list)
+            self.errors = defaultdict(int)
+            self.not_modified = defaultdict(int)
+            self.queries = defaultdict(int)
+    
+    def count_query(self, endpoint):
+        with self._lock:
+            self.queries[endpoint] += 1
+    
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            if status == 304:
+                self.not_modified[endpoint] += 1
+            elif status >= 400:
+                self.errors[endpoint] += 1
+    
+    def summary(self, elapsed):
+        results = {}
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+            results[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'not_modified': self.not_modified[endpoint],
+                'requests_per_sec': round(len(latencies) / elapsed, 1),
+                'p50_ms': percentile(0.50),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'queries_per_request': round(self.queries[endpoint] / len(latencies), 2)
+            }
+        return results
+
+def configure_environment(args, tmp):
+    # create_app() reads its configuration from the environment at import time
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tmp, 'hunt_weekend.db')}"
+    os.environ.setdefault('SCAN_EVENT_WRITE_MODE', 'sync')
+
+def install_query_counter(app, recorder):
+    from flask import has_request_context, request
+    from sqlalchemy import event
+    from src.models.database import db
+    
+    with app.app_context():
+        engine = db.engine
+    
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and request.url_rule is not None:
+            recorder.count_query(f'{request.method} {request.url_rule.rule}')
+
+class Player:
+
+    def __init__(self, email):
+        self.email = email
+        self.token = None
+        self.position = 1
+        self.etags = {}
+
+def call(client, recorder, method, path, endpoint, token=None, etag=None, body=None):
+    headers = {}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    if etag:
+        headers['If-None-Match'] = etag
+    started = time.perf_counter()
+    response = client.open(path, method=method, headers=headers, json=body)
+    recorder.record(endpoint, time.perf_counter() - started, response.status_code)
+    return response
+
+def login_storm(app, recorder, players, concurrency):
+    pending = list(players)
+    lock = threading.Lock()
+    
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                if not pending:
+                    return
+                player = pending.pop()
+            response = call(client, recorder, 'POST', '/api/auth/login', 'POST /api/auth/login',
+                            body={'email': player.email})
+            if response.status_code == 200:
+                data = response.get_json()
+                player.token = data['token']
+                player.position = data['user']['current_step']
+    
+    return run_threads([worker] * concurrency)
+
+def hunt_phase(app, recorder, players, qr_codes, args, admin_token):
+    deadline = time.monotonic() + args.seconds
+    actions = [name for name, _ in PLAYER_MIX]
+    weights = [weight for _, weight in PLAYER_MIX]
+    total_steps = len(qr_codes)
+    
+    def player_worker(index):
+        client = app.test_client()
+        rng = random.Random(args.seed * 1000 + index)
+        while time.monotonic() < deadline:
+            player = players[rng.randrange(len(players))]
+            action = rng.choices(actions, weights)[0]
+            if action in ('current-step', 'progress'):
+                path = f'/api/hunt/{action}'
+                response = call(client, recorder, 'GET', path, f'GET {path}', player.token,
+                                etag=player.etags.get(action))
+                if response.status_code == 200:
+                    player.etags[action] = response.headers.get('ETag')
+            elif action == 'reveal':
+                call(client, recorder, 'POST', '/api/hunt/reveal-location', 'POST /api/hunt/reveal-location',
+                     player.token)
+            else:
+                qr_value = qr_codes[player.position] if action == 'scan-correct' else f'WRONG_{rng.randrange(10 ** 6)}'
+                response = call(client, recorder, 'POST', '/api/hunt/scan-qr', 'POST /api/hunt/scan-qr',
+                                player.token, body={'qr_value': qr_value})
+                if response.status_code == 200 and response.get_json().get('advanced'):
+                    player.position = min(player.position + 1, total_steps)
+            if args.think_ms:
+                time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000)
+    
+    def admin_worker(index):
+        client = app.test_client()
+        etags = {}
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            for path in ADMIN_ENDPOINTS:
+                endpoint = f"GET {path.split('?')[0]}"
+                response = call(client, recorder, 'GET', path, endpoint, admin_token, etag=etags.get(path))
+                if response.status_code == 200:
+                    etags[path] = response.headers.get('ETag')
+            time.sleep(max(0.0, min(args.admin_interval - (time.monotonic() - started),
+                                    deadline - time.monotonic())))
+    
+    workers = [lambda i=i: player_worker(i) for i in range(args.concurrency)]
+    workers += [lambda i=i: admin_worker(i) for i in range(args.admins)]
+    return run_threads(workers)
+
+def run_threads(targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.monotonic() - started
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(args, tmp)
+        from src.main import app, ensure_bootstrapped
+        from src.models.database import db
+        from src.models.hunt import DEFAULT_HUNT_ID
+        from src.services.step_catalog import get_step_catalog
+        
+        ensure_bootstrapped(app)
+        with app.app_context():
+            backend = db.engine.dialect.name
+            hunt = get_step_catalog().get_hunt(DEFAULT_HUNT_ID)
+            qr_codes = {step.position: step.qr_code_value for step in hunt.steps}
+        
+        recorder = Recorder()
+        install_query_counter(app, recorder)
+        run_id = f'{int(time.time())}-{os.getpid()}'
+        players = [Player(f'weekend-{run_id}-{i}@example.com') for i in range(args.players)]
+        
+        login_elapsed = login_storm(app, recorder, players, args.concurrency)
+        login_results = recorder.summary(login_elapsed)
+        players = [player for player in players if player.token]
+        if not players:
+            raise RuntimeError('no player could log in')
+        
+        admin_token = app.test_client().post('/api/auth/admin-login', json={
+            'username': 'admin', 'password': 'admin123'
+        }).get_json()['token']
+        recorder.reset()
+        hunt_elapsed = hunt_phase(app, recorder, players, qr_codes, args, admin_token)
+        
+        return {
+            'recorded_at': datetime.datetime.utcnow().isoformat(),
+            'backend': backend,
+            'python': platform.python_version(),
+            'config': {
+                'players': args.players,
+                'concurrency': args.concurrency,
+                'admins': args.admins,
+                'seconds': args.seconds,
+                'admin_interval': args.admin_interval,
+                'think_ms': args.think_ms,
+                'seed': args.seed
+            },
+            'phases': {
+                'login': {'elapsed_sec': round(login_elapsed, 3), 'endpoints': login_results},
+                'hunt': {'elapsed_sec': round(hunt_elapsed, 3), 'endpoints': recorder.summary(hunt_elapsed)}
+            }
+        }
+
+def compare(result, baseline, tolerance):
+    # (phase, endpoint, metric, baseline value, current value) for every regression
+    regressions = []
+    for phase, data in baseline['phases'].items():
+        current_phase = result['phases'].get(phase, {}).get('endpoints', {})
+        for endpoint, base in data['endpoints'].items():
+            current = current_phase.get(endpoint)
+            if current is None:
+                continue
+            if min(base['requests'], current['requests']) >= MIN_SAMPLES:
+                # p50 flips between cache hits and misses from run to run; p95 is steadier
+                if current['p95_ms'] > base['p95_ms'] * (1 + tolerance) and current['p95_ms'] - base['p95_ms'] > LATENCY_FLOOR_MS:
+                    regressions.append((phase, endpoint, 'p95_ms', base['p95_ms'], current['p95_ms']))
+                if current['requests_per_sec'] < base['requests_per_sec'] * (1 - tolerance):
+                    regressions.append((phase, endpoint, 'requests_per_sec', base['requests_per_sec'],
+                                        current['requests_per_sec']))
+            # Statement counts barely depend on the machine, so a much smaller
+            # margin applies (cache hit rates still vary a little between runs)
+            if current['queries_per_request'] > base['queries_per_request'] * 1.1 + 0.05:
+                regressions.append((phase, endpoint, 'queries_per_request', base['queries_per_request'],
+                                    current['queries_per_request']))
+            if current['errors'] / current['requests'] > base['errors'] / base['requests'] + ERROR_RATE_MARGIN:
+                regressions.append((phase, endpoint, 'errors', base['errors'], current['errors']))
+    return regressions
+
+def print_result(result):
+    config = result['config']
+    print(f"{result['backend']}: {config['players']} players, {config['concurrency']} player threads, "
+          f"{config['admins']} admin threads, {config['seconds']:g}s hunt")
+    print(f"{'phase':<7}{'endpoint':<38}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'304s':>7}{'errors':>8}{'queries':>9}")
+    for phase, data in result['phases'].items():
+        for endpoint, stats in data['endpoints'].items():
+            print(f"{phase:<7}{endpoint:<38}{stats['requests']:>9}{stats['requests_per_sec']:>9.0f}"
+                  f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+                  f"{stats['not_modified']:>7}{stats['errors']:>8}{stats['queries_per_request']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=12)
+    parser.add_argument('--admins', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--admin-interval', type=float, default=1.0)
+    parser.add_argument('--think-ms', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--database-url', help='defaults to a fresh SQLite file')
+    parser.add_argument('--baseline', help='baseline name (default: the database backend)')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative change in latency and throughput')
+    args = parser.parse_args()
+    
+    result = run(args)
+    print_result(result)
+    
+    path = os.path.join(BASELINES, f"{args.baseline or result['backend']}.json")
+    status = 0
+    if args.compare:
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline['config'] != result['config']:
+            print(f'warning: {path} was recorded with {baseline["config"]}')
+        regressions = compare(result, baseline, args.tolerance)
+        for phase, endpoint, metric, before, after in regressions:
+            print(f'REGRESSION {phase} {endpoint} {metric}: {before} -> {after}')
+        if not regressions:
+            print(f'no regressions against {path}')
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {path}')
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
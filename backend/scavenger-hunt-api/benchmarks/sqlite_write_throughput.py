@@ -0,0 +1,109 @@
+"""Concurrent SQLite write throughput with and without the production profile.
+
+Each writer thread repeatedly runs the write half of a successful scan
+(insert a scan event, bump the user's step and last_active) in its own
+transaction against a fresh database file, first with SQLite defaults and
+then with the pragmas from src/models/sqlite_profile.py.
+
+    python benchmarks/sqlite_write_throughput.py --writers 8 --seconds 5
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert, update
+from sqlalchemy.exc import OperationalError
+from src.models.database import db
+from src.models.sqlite_profile import PRODUCTION_PROFILE, apply_sqlite_pragmas
+# Registers every table on db.metadata
+from src.models.user import User
+from src.models.scan_event import ScanEvent
+from src.models.scavenger_step import ScavengerStep
+
+def build_database(path, settings, users):
+    engine = create_engine(f'sqlite:///{path}', pool_size=64, max_overflow=0)
+    if settings:
+        event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, settings))
+    db.metadata.create_all(engine)
+    now = datetime.datetime.utcnow()
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    with engine.begin() as connection:
+        connection.execute(insert(ScavengerStep.__table__), [
+            {'id': i, 'name': f'Step {i}', 'clue': 'clue', 'qr_code_url': None, 'qr_code_value': f'QR_{i}'}
+            for i in range(1, 14)
+        ])
+        connection.execute(insert(User.__table__), [
+            {'id': user_id, 'email': f'{user_id}@example.com', 'current_step': 1, 'created_at': now, 'last_active': now}
+            for user_id in user_ids
+        ])
+    return engine, user_ids
+
+def run(settings, writers, seconds, users):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, user_ids = build_database(os.path.join(tmp, 'bench.db'), settings, users)
+        deadline = time.monotonic() + seconds
+        commits = [0] * writers
+        errors = [0] * writers
+        latencies = [[] for _ in range(writers)]
+        
+        def writer(index):
+            while time.monotonic() < deadline:
+                user_id = user_ids[(index * 7919 + commits[index]) % len(user_ids)]
+                started = time.perf_counter()
+                try:
+                    with engine.begin() as connection:
+                        now = datetime.datetime.utcnow()
+                        connection.execute(insert(ScanEvent.__table__).values(
+                            id=str(uuid.uuid4()), user_id=user_id, step_id=1,
+                            scanned_at=now, success=True, revealed_first=False))
+                        connection.execute(update(User.__table__).where(User.__table__.c.id == user_id)
+                                           .values(current_step=User.__table__.c.current_step % 13 + 1, last_active=now))
+                    commits[index] += 1
+                    latencies[index].append(time.perf_counter() - started)
+                except OperationalError:
+                    errors[index] += 1
+        
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        engine.dispose()
+    
+    all_latencies = sorted(l for per_thread in latencies for l in per_thread)
+    def percentile(p):
+        if not all_latencies:
+            return 0.0
+        return all_latencies[min(len(all_latencies) - 1, int(len(all_latencies) * p))] * 1000
+    return {
+        'commits_per_sec': sum(commits) / elapsed,
+        'errors': sum(errors),
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+    
+    print(f'{args.writers} writers, {args.seconds:g}s per profile')
+    print(f"{'profile':<12}{'commits/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, settings in (('default', {}), ('production', PRODUCTION_PROFILE)):
+        result = run(settings, args.writers, args.seconds, args.users)
+        print(f"{name:<12}{result['commits_per_sec']:>12.0f}{result['p50_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+import asyncio
+import datetime
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from sqlalchemy import select
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+from src.main import app as flask_app, ensure_bootstrapped
+from src.models.async_database import create_async_db_engine
+from src.models.admin_user import AdminUser
+from src.models.user import User
+from src.models.user_step_progress import UserStepProgress, steps_in_order
+from src.routes.auth import verify_token
+from src.routes.hunt import current_step_payload, progress_payload, progress_etag
+from src.services.auth_cache import principal_cache
+from src.services.progress_cache import progress_cache
+from src.services.compression import json_compression, choose_encoding, compress
+from src.services.event_bus import Subscription, event_bus
+from src.services.metrics import metrics
+from src.services.scan_writer import scan_event_writer
+from src.services.step_catalog import get_step_catalog, peek_step_catalog
+
+# ASGI entrypoint: uvicorn src.asgi:app
+#
+# The admin event stream and the hot hunt reads run as native async handlers,
+# so idle SSE clients cost a coroutine instead of a thread. Every other route
+# runs in the Flask app on a bounded thread pool.
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 30
+
+class WsgiBridge:
+    # Runs a WSGI app for ASGI requests. Request bodies are read up front and
+    # responses are buffered, which suits the JSON API and static files.
+    
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+    
+    async def __call__(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        
+        loop = asyncio.get_running_loop()
+        status, headers, chunks = await loop.run_in_executor(
+            self.executor, self._run, self._environ(scope, bytes(body))
+        )
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+    
+    def _environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            if name in environ:
+                value = environ[name] + ',' + value
+            environ[name] = value
+        return environ
+    
+    def _run(self, environ):
+        response = {}
+        
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+        
+        result = self.wsgi_app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+class AsyncSubscription(Subscription):
+    # Event bus subscription that wakes an asyncio task. deliver() runs on
+    # whichever thread published the event.
+    
+    def __init__(self, max_buffer, loop):
+        super().__init__(max_buffer)
+        self.closed = False
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+    
+    def replay(self, events):
+        super().replay(events)
+        self._notify()
+    
+    def deliver(self, event):
+        super().deliver(event)
+        self._notify()
+    
+    def close(self):
+        self.closed = True
+        self._notify()
+    
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+    
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+        return self.wait(timeout=0)
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+def _cors_headers(scope):
+    # Mirrors flask-cors with origins="*"
+    if _header(scope, b'origin'):
+        return [(b'access-control-allow-origin', b'*')]
+    return []
+
+def _encode_json(payload):
+    # Byte-for-byte what Flask's jsonify produces outside debug mode, so both
+    # paths can share progress_cache entries
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode('utf-8')
+
+async def _send_json(scope, send, payload, status=200, headers=()):
+    await _send_body(scope, send, _encode_json(payload), status, headers)
+
+async def _send_body(scope, send, body, status=200, headers=()):
+    headers = [(b'content-type', b'application/json')] + list(headers) + _cors_headers(scope)
+    # Same policy as the Flask app's JsonCompression
+    if status == 200 and 0 < json_compression.min_size <= len(body):
+        headers.append((b'vary', b'Accept-Encoding'))
+        encoding = choose_encoding(parse_accept_header(_header(scope, b'accept-encoding')))
+        if encoding:
+            body = compress(body, encoding, json_compression.gzip_level, json_compression.brotli_quality)
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+    headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _send_empty(scope, send, status, headers=()):
+    await send({'type': 'http.response.start', 'status': status, 'headers': list(headers) + _cors_headers(scope)})
+    await send({'type': 'http.response.body', 'body': b''})
+
+class AsgiApp:
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(
+            max_workers=wsgi_app.config.get('ASGI_THREADS', 32), thread_name_prefix='asgi-wsgi'
+        )
+        self.bridge = WsgiBridge(wsgi_app, self.executor)
+        self.engine = None
+        self._engine_ready = False
+        # (method, path): (handler, endpoint of the equivalent Flask view, for metrics)
+        self.routes = {
+            ('GET', '/api/admin/notifications/stream'): (self.notification_stream, 'admin.notification_stream'),
+            ('GET', '/api/hunt/current-step'): (self.current_step, 'hunt.get_current_step'),
+            ('GET', '/api/hunt/progress'): (self.progress, 'hunt.get_progress')
+        }
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        route = self.routes.get((scope['method'], scope['path']))
+        if route is None:
+            return await self.bridge(scope, receive, send)
+        handler, endpoint = route
+        if not metrics.enabled:
+            return await handler(scope, receive, send)
+        
+        # Requests bridged to Flask are measured by the Flask app itself
+        started = time.perf_counter()
+        shard = metrics.request_started()
+        status = 500
+        
+        async def send_and_record_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        try:
+            return await handler(scope, receive, send_and_record_status)
+        finally:
+            metrics.request_finished(shard, endpoint, scope['method'], status, time.perf_counter() - started)
+    
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # The async handlers bypass Flask's before_request bootstrap
+                await asyncio.get_running_loop().run_in_executor(self.executor, ensure_bootstrapped, self.wsgi_app)
+                self._get_engine()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                # Drain queued scan events before the process exits
+                await asyncio.get_running_loop().run_in_executor(self.executor, scan_event_writer.stop)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    def _get_engine(self):
+        # Created on startup, or on first use under servers without lifespan
+        if not self._engine_ready:
+            self.engine = create_async_db_engine(self.wsgi_app)
+            self._engine_ready = True
+            if self.engine is None:
+                logger.info('Async database driver unavailable; hunt reads are served by Flask')
+            elif metrics.enabled:
+                metrics.instrument_engine(self.engine.sync_engine)
+        return self.engine
+    
+    def _in_app_context(self, func, *args):
+        with self.wsgi_app.app_context():
+            return func(*args)
+    
+    async def _run_sync(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._in_app_context, func, *args
+        )
+    
+    async def _catalog(self):
+        catalog = peek_step_catalog()
+        if catalog is None:
+            catalog = await self._run_sync(get_step_catalog)
+        return catalog
+    
+    async def _admin_exists(self, admin_id):
+        engine = self._get_engine()
+        if engine is None:
+            return await self._run_sync(lambda: principal_cache.load(AdminUser, admin_id) is not None)
+        async with engine.connect() as connection:
+            result = await connection.execute(select(AdminUser.id).where(AdminUser.id == admin_id))
+            return result.first() is not None
+    
+    async def _hunt_read(self, scope, receive, send, view, build, require_step=False):
+        engine = self._get_engine()
+        if engine is None:
+            return await self.bridge(scope, receive, send)
+        
+        auth_header = _header(scope, b'authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return await _send_json(scope, send, {'error': 'No token provided'}, 401)
+        payload = verify_token(auth_header.split(' ')[1])
+        if not payload or payload.get('is_admin'):
+            return await _send_json(scope, send, {'error': 'Invalid token'}, 401)
+        user_id = payload['user_id']
+        
+        try:
+            async with engine.connect() as connection:
+                user = (await connection.execute(
+                    select(User.hunt_id, User.current_step, User.progress_version).where(User.id == user_id)
+                )).first()
+                if user is None:
+                    return await _send_json(scope, send, {'error': 'User not found'}, 404)
+                catalog = await self._catalog()
+                hunt = catalog.get_hunt(user.hunt_id)
+                if hunt is None:
+                    return await _send_json(scope, send, {'error': 'Hunt not found'}, 404)
+                if require_step and not catalog.step_at(hunt.id, user.current_step):
+                    return await _send_json(scope, send, {'error': 'Step not found'}, 404)
+                
+                # Unchanged since the client's last poll: skip loading progress
+                etag = progress_etag(view, user_id, user.progress_version, hunt)
+                cache_headers = [(b'etag', quote_etag(etag, weak=True).encode('latin-1')),
+                                 (b'cache-control', b'private, no-cache')]
+                if parse_etags(_header(scope, b'if-none-match')).contains_weak(etag):
+                    return await _send_empty(scope, send, 304, cache_headers)
+                
+                version = (user.progress_version, hunt.fingerprint)
+                body = progress_cache.get(view, user_id, version)
+                if body is None:
+                    entries = (await connection.execute(
+                        select(UserStepProgress.step_id, UserStepProgress.completed_at, UserStepProgress.revealed_at)
+                        .where(UserStepProgress.user_id == user_id)
+                    )).all()
+                    body = _encode_json(build(catalog, hunt, user.current_step, steps_in_order(entries, 'completed_at'),
+                                              steps_in_order(entries, 'revealed_at')))
+                    progress_cache.put(view, user_id, version, body)
+            return await _send_body(scope, send, body, 200, cache_headers)
+        except Exception as e:
+            return await _send_json(scope, send, {'error': str(e)}, 500)
+    
+    async def current_step(self, scope, receive, send):
+        def build(catalog, hunt, current, completed_steps, revealed_locations):
+            return current_step_payload(hunt, catalog.step_at(hunt.id, current), current,
+                                        completed_steps, revealed_locations)
+        return await self._hunt_read(scope, receive, send, 'current-step', build, require_step=True)
+    
+    async def progress(self, scope, receive, send):
+        def build(catalog, hunt, current, completed_steps, revealed_locations):
+            return progress_payload(hunt, current, completed_steps, revealed_locations)
+        return await self._hunt_read(scope, receive, send, 'progress', build)
+    
+    async def notification_stream(self, scope, receive, send):
+        auth_header = _header(scope, b'authorization')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return await _send_json(scope, send, {'error': 'No token provided'}, 401)
+        payload = verify_token(auth_header.split(' ')[1])
+        if not payload or not payload.get('is_admin'):
+            return await _send_json(scope, send, {'error': 'Admin access required'}, 403)
+        if not await self._admin_exists(payload['user_id']):
+            return await _send_json(scope, send, {'error': 'Admin not found'}, 404)
+        
+        # Resume after the last event the client saw, if it is still in history
+        last_event_id = _header(scope, b'last-event-id')
+        if not last_event_id:
+            query = dict(
+                part.split('=', 1) for part in scope.get('query_string', b'').decode('latin-1').split('&') if '=' in part
+            )
+            last_event_id = query.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+        
+        subscription = AsyncSubscription(event_bus.broadcaster.client_buffer, asyncio.get_running_loop())
+        event_bus.subscribe(last_event_id, subscription)
+        
+        async def watch_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscription.close()
+        
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream; charset=utf-8'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')
+                ] + _cors_headers(scope)
+            })
+            while True:
+                events = await subscription.wait_async(HEARTBEAT_INTERVAL)
+                if subscription.closed:
+                    return
+                if subscription.dropped:
+                    # Too far behind; the id makes the client reconnect from the
+                    # newest event instead of replaying what it missed again
+                    resume = f'id: {subscription.last_id}\n' if subscription.last_id is not None else ''
+                    message = f"{resume}data: {json.dumps({'type': 'dropped', 'timestamp': datetime.datetime.utcnow().isoformat()})}\n\n"
+                    await send({'type': 'http.response.body', 'body': message.encode('utf-8')})
+                    break
+                if not events:
+                    message = f"data: {json.dumps({'type': 'heartbeat', 'timestamp': datetime.datetime.utcnow().isoformat()})}\n\n"
+                else:
+                    message = ''.join(
+                        f"id: {event.id}\ndata: {json.dumps(dict(event.data, type=event.type))}\n\n" for event in events
+                    )
+                await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            # Client went away mid-write
+            pass
+        finally:
+            event_bus.unsubscribe(subscription)
+            watcher.cancel()
+
+app = AsgiApp(flask_app)
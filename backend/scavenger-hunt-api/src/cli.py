@@ -0,0 +1,61 @@
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from src.models.hunt import DEFAULT_HUNT_ID
+from src.services.bootstrap import bootstrap_database
+from src.services.population import populate
+from src.services.step_catalog import get_step_catalog
+from src.services.static_assets import precompress_static
+
+hunt_cli = AppGroup('hunt', help='Scavenger hunt maintenance commands.')
+
+@hunt_cli.command('bootstrap')
+def bootstrap_command():
+    """Create or upgrade the schema and seed the default admin and steps."""
+    started = time.perf_counter()
+    migrations, created = bootstrap_database()
+    current_app.extensions['hunt_bootstrapped'] = True
+    for name in migrations:
+        click.echo(f'Applied migration {name}')
+    for item in created:
+        click.echo(f'Created {item}')
+    click.echo(f'Database ready in {time.perf_counter() - started:.2f}s')
+
+@hunt_cli.command('compress-static')
+@click.option('--min-size', default=1024, show_default=True, help='Skip files smaller than this many bytes.')
+def compress_static_command(min_size):
+    """Write .gz/.br variants of the bundled frontend for precompressed serving."""
+    written = precompress_static(current_app.static_folder, min_size=min_size)
+    for path in written:
+        click.echo(f'Wrote {path}')
+    click.echo(f'{len(written)} compressed files; restart the server to pick them up')
+
+@hunt_cli.command('populate')
+@click.option('--users', default=10000, show_default=True, help='Players to create.')
+@click.option('--events', type=int, help='Scan events to create in total [default: 50 per player].')
+@click.option('--hunt-id', default=DEFAULT_HUNT_ID, show_default=True, help='Hunt the players are enrolled in.')
+@click.option('--batch-size', default=10000, show_default=True, help='Players per transaction.')
+@click.option('--seed', type=int, help='Random seed for a reproducible population.')
+@click.option('--prefix', help='Email prefix [default: unique per run].')
+@click.option('--days', default=2.0, show_default=True, help='Spread sign-ups over this many days up to now.')
+@click.option('--defer-indexes/--keep-indexes', default=True, show_default=True,
+              help='Drop the scan_events and user_step_progress indexes during the load and rebuild them after.')
+def populate_command(users, events, hunt_id, batch_size, seed, prefix, days, defer_indexes):
+    """Bulk-generate players, progress and scan events for performance testing."""
+    hunt = get_step_catalog().get_hunt(hunt_id)
+    if hunt is None or not hunt.steps:
+        raise click.ClickException(f'Hunt {hunt_id} not found or has no steps; run `flask hunt bootstrap` first')
+    if events is None:
+        events = users * 50
+    prefix = prefix or f'pop{int(time.time())}-'
+    
+    def report(progress):
+        click.echo(f'{progress.users} players, {progress.scan_events} scan events '
+                   f'({progress.scan_events / progress.seconds:,.0f} rows/s)')
+    
+    result = populate(hunt, users, events, batch_size=batch_size, seed=seed, prefix=prefix, days=days,
+                      defer_indexes=defer_indexes, on_batch=report)
+    click.echo(f'Created {result.users} players, {result.progress_rows} progress rows and '
+               f'{result.scan_events} scan events ({result.successful_scans} successful) '
+               f'in {result.seconds:.1f}s')
@@ -3,166 +3,159 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import logging
+import threading
+from flask import Flask
 from flask_cors import CORS
-from src.models.database import db
+from src.models.database import db, database_uri, engine_options, configure_statement_timeout
+from src.models.sqlite_profile import configure_sqlite
 from src.routes.auth import auth_bp
 from src.routes.hunt import hunt_bp
 from src.routes.admin import admin_bp
+from src.services.auth_cache import configure_auth_caches, token_cache, principal_cache
+from src.services.progress_cache import configure_progress_cache, progress_cache
+from src.services.step_catalog import configure_step_catalog
+from src.services.metrics import metrics
+from src.services.sql_profiler import sql_profiler
+from src.services.profiling import sampling_profiler
+from src.services.scan_writer import scan_event_writer
+from src.services.event_bus import event_bus
+from src.services.static_assets import static_assets
+from src.services.compression import json_compression
+from src.services.bootstrap import bootstrap_database
+from src.cli import hunt_cli
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'scavenger-hunt-secret-key-2024'
+logger = logging.getLogger(__name__)
 
-# Enable CORS for all routes
-CORS(app, origins="*")
+_bootstrap_lock = threading.Lock()
 
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(hunt_bp, url_prefix='/api/hunt')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
+def ensure_bootstrapped(app):
+    # Lazy schema/seed check, once per process, for deployments that do not
+    # run `flask hunt bootstrap` themselves (AUTO_BOOTSTRAP=false skips it)
+    if app.extensions.get('hunt_bootstrapped') or not app.config.get('AUTO_BOOTSTRAP', True):
+        return
+    with _bootstrap_lock:
+        if app.extensions.get('hunt_bootstrapped'):
+            return
+        with app.app_context():
+            try:
+                bootstrap_database()
+            except Exception:
+                # e.g. another worker creating the same tables; retried on the next request
+                db.session.rollback()
+                logger.exception('Database bootstrap failed')
+                return
+        app.extensions['hunt_bootstrapped'] = True
 
-# Import and register user blueprint for health check
-from src.routes.user import user_bp
-app.register_blueprint(user_bp, url_prefix='/api')
-
-# Database configuration - using SQLite
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///scavenger_hunt.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-    # Initialize default data
-    from src.models.scavenger_step import ScavengerStep
-    from src.models.admin_user import AdminUser
-    from werkzeug.security import generate_password_hash
-    
-    # Create default admin user if not exists
-    if not AdminUser.query.filter_by(username='admin').first():
-        admin = AdminUser(
-            username='admin',
-            password_hash=generate_password_hash('admin123')
-        )
-        db.session.add(admin)
-    
-    # Create scavenger hunt steps if not exist
-    if ScavengerStep.query.count() == 0:
-        steps_data = [
-            {
-                "id": 1,
-                "name": "Black Cat Alley",
-                "clue": "Find the place where cats don't purr — they pop with color on the wall for sure.",
-                "qr_code_url": "URL_TO_QR_CODE_1",
-                "qr_code_value": "BLACKCAT_ALLEY_001"
-            },
-            {
-                "id": 2,
-                "name": "Milwaukee Art Museum",
-                "clue": "What flaps like a bird but never flies? Find the building that spreads its wings by the lake.",
-                "qr_code_url": "URL_TO_QR_CODE_2",
-                "qr_code_value": "ART_MUSEUM_002"
-            },
-            {
-                "id": 3,
-                "name": "Discovery World",
-                "clue": "Where science meets the sea, you'll find a big ship and tech to see.",
-                "qr_code_url": "URL_TO_QR_CODE_3",
-                "qr_code_value": "DISCOVERY_WORLD_003"
-            },
-            {
-                "id": 4,
-                "name": "Lakeshore State Park",
-                "clue": "A park on water — now that's rare! Find the trail with skyline flair.",
-                "qr_code_url": "URL_TO_QR_CODE_4",
-                "qr_code_value": "LAKESHORE_PARK_004"
-            },
-            {
-                "id": 5,
-                "name": "Pierhead Lighthouse",
-                "clue": "It's red and bright and guards the shore, you'll find it near the lakeside floor.",
-                "qr_code_url": "URL_TO_QR_CODE_5",
-                "qr_code_value": "PIERHEAD_LIGHT_005"
-            },
-            {
-                "id": 6,
-                "name": "Historic Third Ward",
-                "clue": "Old warehouses with modern flair, boutiques and murals everywhere!",
-                "qr_code_url": "URL_TO_QR_CODE_6",
-                "qr_code_value": "THIRD_WARD_006"
-            },
-            {
-                "id": 7,
-                "name": "The Hop - Historic Third Ward Stop",
-                "clue": "You don't need a ticket, just wait for the ride. Find the streetcar track and pose with pride!",
-                "qr_code_url": "URL_TO_QR_CODE_7",
-                "qr_code_value": "HOP_STATION_007"
-            },
-            {
-                "id": 8,
-                "name": "Milwaukee Public Market",
-                "clue": "Inside this market, smells float in the air — find cheese, spice, or chocolate fair!",
-                "qr_code_url": "URL_TO_QR_CODE_8",
-                "qr_code_value": "PUBLIC_MARKET_008"
-            },
-            {
-                "id": 9,
-                "name": "Gertie the Duck Statue",
-                "clue": "She once sat beneath a bridge, a wartime hero with a nest to rig.",
-                "qr_code_url": "URL_TO_QR_CODE_9",
-                "qr_code_value": "GERTIE_DUCK_009"
-            },
-            {
-                "id": 10,
-                "name": "The Bronze Fonz",
-                "clue": '"Ayyyy!" is what he\'d say — find this cool guy by the river today.',
-                "qr_code_url": "URL_TO_QR_CODE_10",
-                "qr_code_value": "BRONZE_FONZ_010"
-            },
-            {
-                "id": 11,
-                "name": "Marcus Performing Arts Center",
-                "clue": "Music and drama live here night and day. Find a poster or sculpture on display!",
-                "qr_code_url": "URL_TO_QR_CODE_11",
-                "qr_code_value": "MARCUS_ARTS_011"
-            },
-            {
-                "id": 12,
-                "name": "Milwaukee City Hall",
-                "clue": "With its tall clock tower and historic face, this building stands with elegant grace.",
-                "qr_code_url": "URL_TO_QR_CODE_12",
-                "qr_code_value": "CITY_HALL_012"
-            },
-            {
-                "id": 13,
-                "name": "The Pfister Hotel / Blu Lounge",
-                "clue": "Time to celebrate your final clue — find the place with a stunning view.",
-                "qr_code_url": "URL_TO_QR_CODE_13",
-                "qr_code_value": "PFISTER_HOTEL_013"
-            }
-        ]
-        
-        for step_data in steps_data:
-            step = ScavengerStep(**step_data)
-            db.session.add(step)
-    
-    db.session.commit()
+def create_app():
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'scavenger-hunt-secret-key-2024'
+    
+    # Auth caches: verified JWT payloads, plus an optional short-lived cache of
+    # the User/AdminUser rows behind them (seconds; 0 disables it)
+    app.config['TOKEN_CACHE_SIZE'] = 10000
+    app.config['PRINCIPAL_CACHE_TTL'] = float(os.environ.get('PRINCIPAL_CACHE_TTL', 0))
+    # Seconds between checks for rows other worker processes evicted
+    app.config['PRINCIPAL_CACHE_SYNC_INTERVAL'] = float(os.environ.get('PRINCIPAL_CACHE_SYNC_INTERVAL', 1.0))
+    configure_auth_caches(app.config)
+    
+    # Seconds between checks of the shared step catalog version, which picks
+    # up step and hunt changes made through other worker processes
+    app.config['STEP_CATALOG_CHECK_INTERVAL'] = float(os.environ.get('STEP_CATALOG_CHECK_INTERVAL', 1.0))
+    configure_step_catalog(app.config)
+    
+    # Serialized current-step/progress bodies per user, bounded by total size
+    app.config['PROGRESS_CACHE_MAX_BYTES'] = int(os.environ.get('PROGRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    configure_progress_cache(app.config)
+    
+    # Enable CORS for all routes
+    CORS(app, origins="*")
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(hunt_bp, url_prefix='/api/hunt')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    
+    # Import and register user blueprint for health check
+    from src.routes.user import user_bp
+    app.register_blueprint(user_bp, url_prefix='/api')
+    
+    # Database configuration - SQLite by default, or any SQLAlchemy URL in
+    # DATABASE_URL (e.g. postgresql://... or mysql+pymysql://...)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    # SQLite connection profile: 'production' (WAL, busy timeout, synchronous=NORMAL,
+    # larger page cache and mmap) or 'default' to keep SQLite's own settings
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_CHECKPOINT_INTERVAL'] = int(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', 60))
+    db.init_app(app)
+    configure_sqlite(app)
+    configure_statement_timeout(app)
+    
+    # Prometheus metrics at /metrics: request latency and status per endpoint,
+    # SQL statements per request, pool checkouts and cache hit ratios
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes', 'on')
+    metrics.init_app(app)
+    metrics.register_cache('token', token_cache.stats)
+    metrics.register_cache('principal', principal_cache.stats)
+    metrics.register_cache('progress', progress_cache.stats)
+    
+    # Opt-in SQL profiling: Server-Timing header and a log line per request,
+    # with a warning when one statement shape repeats this often (N+1)
+    app.config['SQL_PROFILING'] = os.environ.get('SQL_PROFILING', 'false').lower() in ('1', 'true', 'yes', 'on')
+    app.config['SQL_PROFILE_REPEAT_THRESHOLD'] = int(os.environ.get('SQL_PROFILE_REPEAT_THRESHOLD', 5))
+    sql_profiler.init_app(app)
+    # Tracks which threads serve requests, for on-demand CPU profiles
+    sampling_profiler.init_app(app)
+    
+    # Scan event writes: 'sync' inserts in the request transaction, 'async'
+    # queues them for a background writer that batches inserts
+    app.config['SCAN_EVENT_WRITE_MODE'] = os.environ.get('SCAN_EVENT_WRITE_MODE', 'sync')
+    app.config['SCAN_EVENT_DURABILITY'] = os.environ.get('SCAN_EVENT_DURABILITY', 'strict')
+    app.config['SCAN_EVENT_QUEUE_SIZE'] = int(os.environ.get('SCAN_EVENT_QUEUE_SIZE', 10000))
+    app.config['SCAN_EVENT_BATCH_SIZE'] = int(os.environ.get('SCAN_EVENT_BATCH_SIZE', 500))
+    app.config['SCAN_EVENT_FLUSH_MS'] = int(os.environ.get('SCAN_EVENT_FLUSH_MS', 200))
+    scan_event_writer.init_app(app)
+    
+    # Admin event stream: in-process by default, or relayed through a
+    # Redis-compatible server (redis://...) so all worker processes share it
+    app.config['EVENT_BUS_URL'] = os.environ.get('EVENT_BUS_URL')
+    app.config['EVENT_STREAM_HISTORY'] = int(os.environ.get('EVENT_STREAM_HISTORY', 1000))
+    app.config['EVENT_STREAM_CLIENT_BUFFER'] = int(os.environ.get('EVENT_STREAM_CLIENT_BUFFER', 256))
+    event_bus.init_app(app)
+    
+    # Worker threads for the Flask routes when served by the ASGI app (src/asgi.py)
+    app.config['ASGI_THREADS'] = int(os.environ.get('ASGI_THREADS', 32))
+    
+    # Schema and seed data: `flask hunt bootstrap`, or lazily before the
+    # first request unless AUTO_BOOTSTRAP is off
+    app.config['AUTO_BOOTSTRAP'] = os.environ.get('AUTO_BOOTSTRAP', 'true').lower() in ('1', 'true', 'yes', 'on')
+    
+    @app.before_request
+    def bootstrap_on_first_request():
+        ensure_bootstrapped(app)
+    
+    app.cli.add_command(hunt_cli)
+    
+    # gzip/brotli for JSON bodies of at least this many bytes (0 disables)
+    app.config['JSON_COMPRESS_MIN_BYTES'] = int(os.environ.get('JSON_COMPRESS_MIN_BYTES', 1024))
+    json_compression.init_app(app)
+    
+    # Bundled PWA, indexed once at startup; small files are served from memory
+    app.config['STATIC_INLINE_MAX_BYTES'] = int(os.environ.get('STATIC_INLINE_MAX_BYTES', 64 * 1024))
+    app.config['STATIC_MEMORY_LIMIT_BYTES'] = int(os.environ.get('STATIC_MEMORY_LIMIT_BYTES', 16 * 1024 * 1024))
+    static_assets.init_app(app)
+    app.add_url_rule('/', defaults={'path': ''}, view_func=serve)
+    app.add_url_rule('/<path:path>', view_func=serve)
+    return app
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    return static_assets.serve(path)
 
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
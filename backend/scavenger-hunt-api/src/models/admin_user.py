@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from src.models.database import db
+from src.models.database import db, Timestamp
 
 class AdminUser(db.Model):
     __tablename__ = 'admin_users'
@@ -8,7 +8,7 @@ class AdminUser(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     username = db.Column(db.String(100), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(Timestamp, default=datetime.utcnow)
     
     def __init__(self, username, password_hash):
         self.username = username
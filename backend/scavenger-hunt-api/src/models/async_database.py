@@ -0,0 +1,63 @@
+import logging
+from sqlalchemy import event
+from src.models.database import db, engine_options
+from src.models.sqlite_profile import sqlite_settings, apply_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+# Async drivers for the sync URLs the app is configured with. They are
+# optional: without one, the ASGI app serves every route through Flask.
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql'
+}
+
+def async_database_url(url):
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        return None
+    return url.set(drivername=driver)
+
+def _async_engine_options(url, app):
+    options = engine_options(url.render_as_string(hide_password=False))
+    # psycopg2-style connect_args do not apply to asyncpg
+    options.pop('connect_args', None)
+    statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+    return options
+
+def create_async_db_engine(app):
+    # Returns None when no async driver is installed for the configured database
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+    except ImportError:
+        return None
+    with app.app_context():
+        url = async_database_url(db.engine.url)
+    if url is None:
+        return None
+    try:
+        engine = create_async_engine(url, **_async_engine_options(url, app))
+    except ImportError:
+        logger.info('No async driver for %s; serving through the WSGI app', url.drivername)
+        return None
+    
+    if url.get_backend_name() == 'sqlite':
+        settings = sqlite_settings(app.config)
+        if settings:
+            @event.listens_for(engine.sync_engine, 'connect')
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                apply_sqlite_pragmas(dbapi_connection, settings)
+    elif url.get_backend_name() == 'mysql' and app.config.get('DB_STATEMENT_TIMEOUT_MS', 0):
+        statement_timeout = int(app.config['DB_STATEMENT_TIMEOUT_MS'])
+        
+        @event.listens_for(engine.sync_engine, 'connect')
+        def set_mysql_statement_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f'SET SESSION max_execution_time={statement_timeout}')
+            finally:
+                cursor.close()
+    return engine
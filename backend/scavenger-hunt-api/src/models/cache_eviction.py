@@ -0,0 +1,21 @@
+from datetime import datetime
+from src.models.database import db, Timestamp
+
+class CacheEviction(db.Model):
+    # Keys dropped from a per-process cache, so the other worker processes
+    # drop them too. Rows are only needed for a short while and get pruned.
+    __tablename__ = 'cache_evictions'
+    __table_args__ = (
+        # Sync window of PrincipalCache and pruning of old records
+        db.Index('ix_cache_evictions_created', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    cache = db.Column(db.String(50), nullable=False)
+    cache_key = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(Timestamp, nullable=False, default=datetime.utcnow)
+    
+    def __init__(self, cache, cache_key):
+        self.cache = cache
+        self.cache_key = cache_key
+        self.created_at = datetime.utcnow()
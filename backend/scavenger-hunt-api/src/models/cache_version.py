@@ -0,0 +1,14 @@
+from src.models.database import db
+
+class CacheVersion(db.Model):
+    # Shared version counters for data every worker process keeps a copy of
+    # (the step catalog). Writers bump the counter; each process compares it
+    # with the version of its copy and reloads when they differ.
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __init__(self, name, version=0):
+        self.name = name
+        self.version = version
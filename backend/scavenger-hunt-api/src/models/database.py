@@ -1,4 +1,61 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
 
 db = SQLAlchemy()
 
+# DateTime that keeps microseconds on MySQL, whose DATETIME defaults to
+# whole seconds; event ordering and keyset pagination rely on the fraction
+Timestamp = db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+DEFAULT_DATABASE_URI = 'sqlite:///scavenger_hunt.db'
+
+def _flag(value):
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def database_uri(environ=os.environ):
+    uri = environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Hosting providers hand out driver-less URLs; PyMySQL is the bundled MySQL driver
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    elif uri.startswith('mysql://'):
+        uri = 'mysql+pymysql://' + uri[len('mysql://'):]
+    return uri
+
+def engine_options(uri, environ=os.environ):
+    # Pool settings for server databases. SQLite keeps SQLAlchemy's default
+    # pool; its connection settings live in sqlite_profile.py.
+    if uri.startswith('sqlite'):
+        return {}
+    
+    options = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': _flag(environ.get('DB_POOL_PRE_PING', 'true'))
+    }
+    statement_timeout = int(environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and uri.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+def configure_statement_timeout(app):
+    # PostgreSQL gets its timeout through connect_args; MySQL needs a session
+    # variable on every new connection (it applies to SELECT statements)
+    statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    if not statement_timeout:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'mysql':
+        return
+    
+    @event.listens_for(engine, 'connect')
+    def set_mysql_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'SET SESSION max_execution_time={int(statement_timeout)}')
+        finally:
+            cursor.close()
@@ -0,0 +1,69 @@
+from datetime import datetime
+from src.models.database import db, Timestamp
+
+# Hunt that users join unless they pick another one; existing installs had
+# exactly this one hunt
+DEFAULT_HUNT_ID = 1
+DEFAULT_HUNT = {
+    'id': DEFAULT_HUNT_ID,
+    'slug': 'milwaukee',
+    'name': 'Milwaukee Scavenger Hunt',
+    'city': 'Milwaukee'
+}
+
+class Hunt(db.Model):
+    __tablename__ = 'hunts'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(100), unique=True, nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    city = db.Column(db.String(255), nullable=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(Timestamp, default=datetime.utcnow)
+    
+    # Relationships
+    steps = db.relationship('HuntStep', backref='hunt', lazy=True, order_by='HuntStep.position',
+                            cascade='all, delete-orphan')
+    
+    def __init__(self, slug, name, city=None, is_active=True, id=None):
+        self.id = id
+        self.slug = slug
+        self.name = name
+        self.city = city
+        self.is_active = is_active
+        self.created_at = datetime.utcnow()
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'slug': self.slug,
+            'name': self.name,
+            'city': self.city,
+            'is_active': self.is_active,
+            'total_steps': len(self.steps),
+            'created_at': self.created_at.isoformat()
+        }
+
+class HuntStep(db.Model):
+    # Ordering of scavenger_steps within a hunt. A step belongs to at most one
+    # hunt, so per-user progress keyed by step id stays unambiguous.
+    __tablename__ = 'hunt_steps'
+    __table_args__ = (
+        db.UniqueConstraint('step_id', name='uq_hunt_steps_step'),
+    )
+    
+    hunt_id = db.Column(db.Integer, db.ForeignKey('hunts.id'), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    step_id = db.Column(db.Integer, db.ForeignKey('scavenger_steps.id'), nullable=False)
+    
+    def __init__(self, hunt_id, position, step_id):
+        self.hunt_id = hunt_id
+        self.position = position
+        self.step_id = step_id
+    
+    def to_dict(self):
+        return {
+            'hunt_id': self.hunt_id,
+            'position': self.position,
+            'step_id': self.step_id
+        }
@@ -0,0 +1,140 @@
+import json
+from datetime import datetime
+from sqlalchemy import inspect, text, column
+from src.models.database import db, Timestamp
+from src.models.user import User
+from src.models.cache_eviction import CacheEviction
+from src.models.user_step_progress import UserStepProgress
+from src.models.scan_event import ScanEvent
+from src.models.hunt import Hunt, HuntStep, DEFAULT_HUNT, DEFAULT_HUNT_ID
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(Timestamp, default=datetime.utcnow)
+    
+    def __init__(self, version, name):
+        self.version = version
+        self.name = name
+        self.applied_at = datetime.utcnow()
+
+def _create_indexes(table, *names):
+    # CREATE INDEX for indexes declared on the model but missing from an
+    # existing database file; fresh databases already have them from create_all
+    for index in table.indexes:
+        if index.name in names:
+            index.create(db.engine, checkfirst=True)
+
+def migrate_legacy_progress():
+    # One-shot copy of the old users.completed_steps / users.revealed_locations
+    # JSON columns into user_step_progress. Migrated rows have both columns set
+    # to NULL, so running this again is a no-op.
+    columns = {c['name'] for c in inspect(db.engine).get_columns('users')}
+    if 'completed_steps' not in columns or 'revealed_locations' not in columns:
+        return 0
+    
+    rows = db.session.execute(text(
+        "SELECT id, completed_steps, revealed_locations, last_active FROM users "
+        "WHERE completed_steps IS NOT NULL OR revealed_locations IS NOT NULL"
+    ).columns(column('id'), column('completed_steps'), column('revealed_locations'),
+              column('last_active', db.DateTime))).all()
+    if not rows:
+        return 0
+    
+    # The JSON arrays carry no timestamps, so last_active is the best available
+    progress = {}
+    for user_id, completed_raw, revealed_raw, last_active in rows:
+        for step_id in json.loads(completed_raw or '[]'):
+            entry = progress.setdefault((user_id, step_id), {'completed_at': None, 'revealed_at': None})
+            entry['completed_at'] = last_active
+        for step_id in json.loads(revealed_raw or '[]'):
+            entry = progress.setdefault((user_id, step_id), {'completed_at': None, 'revealed_at': None})
+            entry['revealed_at'] = last_active
+    
+    if progress:
+        db.session.execute(UserStepProgress.__table__.insert(), [
+            {'user_id': user_id, 'step_id': step_id, **timestamps}
+            for (user_id, step_id), timestamps in progress.items()
+        ])
+    db.session.execute(text(
+        "UPDATE users SET completed_steps = NULL, revealed_locations = NULL "
+        "WHERE completed_steps IS NOT NULL OR revealed_locations IS NOT NULL"
+    ))
+    db.session.commit()
+    return len(rows)
+
+def add_scan_event_indexes():
+    _create_indexes(ScanEvent.__table__,
+                    'ix_scan_events_user_scanned',
+                    'ix_scan_events_step_scanned',
+                    'ix_scan_events_success')
+
+def add_progress_version():
+    # Existing rows start at 0; fresh databases get the column from create_all
+    columns = {c['name'] for c in inspect(db.engine).get_columns('users')}
+    if 'progress_version' in columns:
+        return
+    db.session.execute(text("ALTER TABLE users ADD COLUMN progress_version INTEGER NOT NULL DEFAULT 0"))
+    db.session.commit()
+
+def add_hunts():
+    # Single-hunt installs: enroll everyone in the default hunt and place the
+    # existing steps in it in id order, so current_step keeps pointing at the
+    # same step. Fresh databases are seeded by bootstrap instead.
+    columns = {c['name'] for c in inspect(db.engine).get_columns('users')}
+    if 'hunt_id' not in columns:
+        db.session.execute(text(
+            f"ALTER TABLE users ADD COLUMN hunt_id INTEGER NOT NULL DEFAULT {DEFAULT_HUNT_ID}"
+        ))
+    
+    step_ids = db.session.execute(text("SELECT id FROM scavenger_steps ORDER BY id")).scalars().all()
+    if step_ids and db.session.query(Hunt.id).first() is None:
+        db.session.add(Hunt(**DEFAULT_HUNT))
+        db.session.flush()
+        db.session.execute(HuntStep.__table__.insert(), [
+            {'hunt_id': DEFAULT_HUNT_ID, 'position': position, 'step_id': step_id}
+            for position, step_id in enumerate(step_ids, start=1)
+        ])
+    db.session.commit()
+
+def add_user_hunt_index():
+    _create_indexes(User.__table__, 'ix_users_hunt')
+
+def add_user_created_index():
+    _create_indexes(User.__table__, 'ix_users_created')
+
+def add_scan_event_time_index():
+    _create_indexes(ScanEvent.__table__, 'ix_scan_events_scanned')
+
+def add_cache_eviction_time_index():
+    _create_indexes(CacheEviction.__table__, 'ix_cache_evictions_created')
+
+# Ordered schema migrations. Append new entries with the next version number;
+# never renumber or remove an entry once it has shipped.
+MIGRATIONS = [
+    (1, 'user_step_progress', migrate_legacy_progress),
+    (2, 'scan_event_indexes', add_scan_event_indexes),
+    (3, 'user_progress_version', add_progress_version),
+    (4, 'hunts', add_hunts),
+    (5, 'user_hunt_index', add_user_hunt_index),
+    (6, 'user_created_index', add_user_created_index),
+    (7, 'scan_event_time_index', add_scan_event_time_index),
+    (8, 'cache_eviction_time_index', add_cache_eviction_time_index),
+]
+
+def apply_migrations():
+    # Run every migration not yet recorded in schema_migrations, in order.
+    # Expects db.create_all() to have run so new tables already exist.
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    ran = []
+    for version, name, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate()
+        db.session.add(SchemaMigration(version=version, name=name))
+        db.session.commit()
+        ran.append(name)
+    return ran
@@ -1,14 +1,23 @@
 import uuid
 from datetime import datetime
-from src.models.database import db
+from src.models.database import db, Timestamp
 
 class ScanEvent(db.Model):
     __tablename__ = 'scan_events'
+    __table_args__ = (
+        # Per-user and per-step histories, newest first
+        db.Index('ix_scan_events_user_scanned', 'user_id', 'scanned_at'),
+        db.Index('ix_scan_events_step_scanned', 'step_id', 'scanned_at'),
+        # Successful scan counts on /stats
+        db.Index('ix_scan_events_success', 'success'),
+        # Newest-first feed of /api/admin/events
+        db.Index('ix_scan_events_scanned', 'scanned_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     step_id = db.Column(db.Integer, db.ForeignKey('scavenger_steps.id'), nullable=False)
-    scanned_at = db.Column(db.DateTime, default=datetime.utcnow)
+    scanned_at = db.Column(Timestamp, default=datetime.utcnow)
     success = db.Column(db.Boolean, nullable=False)
     revealed_first = db.Column(db.Boolean, default=False)
     
@@ -3,7 +3,7 @@ from src.models.database import db
 class ScavengerStep(db.Model):
     __tablename__ = 'scavenger_steps'
     
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
     name = db.Column(db.String(255), nullable=False)
     clue = db.Column(db.Text, nullable=False)
     qr_code_url = db.Column(db.String(500), nullable=True)
@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+from sqlalchemy import event, text
+from src.models.database import db
+
+logger = logging.getLogger(__name__)
+
+# Connection settings for file-backed SQLite under concurrent writers.
+# WAL lets readers proceed while one writer commits, busy_timeout makes
+# writers wait for the lock instead of failing with "database is locked",
+# and synchronous=NORMAL is durable across application crashes in WAL mode
+# (only an OS crash or power loss can roll back the latest commits).
+PRODUCTION_PROFILE = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024
+}
+
+def sqlite_settings(config):
+    if config.get('SQLITE_PROFILE', 'production') != 'production':
+        return {}
+    return {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', PRODUCTION_PROFILE['journal_mode']),
+        'busy_timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', PRODUCTION_PROFILE['busy_timeout']),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', PRODUCTION_PROFILE['synchronous']),
+        'mmap_size': config.get('SQLITE_MMAP_SIZE', PRODUCTION_PROFILE['mmap_size']),
+        'cache_size': config.get('SQLITE_CACHE_SIZE', PRODUCTION_PROFILE['cache_size'])
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, settings):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in settings.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+class WalCheckpointer:
+    # Periodic PASSIVE checkpoint so the -wal file does not grow without
+    # bound between SQLite's automatic checkpoints on busy databases
+    
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+    
+    def ensure_started(self):
+        if self.interval <= 0 or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='sqlite-wal-checkpoint', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    with db.engine.connect() as connection:
+                        connection.execute(text('PRAGMA wal_checkpoint(PASSIVE)'))
+            except Exception:
+                logger.exception('WAL checkpoint failed')
+    
+    def stop(self):
+        self._stop.set()
+
+def configure_sqlite(app):
+    # Apply the SQLite profile to every new pooled connection; a no-op for
+    # other database backends
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return None
+    
+    settings = sqlite_settings(app.config)
+    if settings:
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, settings)
+    
+    if settings.get('journal_mode', '').upper() != 'WAL':
+        return None
+    checkpointer = WalCheckpointer(app, app.config.get('SQLITE_CHECKPOINT_INTERVAL', 60))
+    app.before_request(checkpointer.ensure_started)
+    return checkpointer
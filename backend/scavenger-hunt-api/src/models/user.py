@@ -1,63 +1,109 @@
 import uuid
 from datetime import datetime
-from src.models.database import db
+from sqlalchemy import inspect
+from sqlalchemy.orm.collections import attribute_keyed_dict
+from src.models.database import db, Timestamp
+from src.models.hunt import DEFAULT_HUNT_ID
+from src.models.user_step_progress import UserStepProgress, steps_in_order
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Enrolled players per hunt on /stats
+        db.Index('ix_users_hunt', 'hunt_id'),
+        # Keyset pages of /api/admin/users, newest first
+        db.Index('ix_users_created', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     email = db.Column(db.String(255), unique=True, nullable=True)
     phone = db.Column(db.String(20), unique=True, nullable=True)
+    # Hunt the user is enrolled in; current_step is a position within it
+    hunt_id = db.Column(db.Integer, db.ForeignKey('hunts.id'), nullable=False,
+                        default=DEFAULT_HUNT_ID, server_default=str(DEFAULT_HUNT_ID))
     current_step = db.Column(db.Integer, default=1)
-    completed_steps = db.Column(db.Text, default='[]')  # JSON array as string
-    revealed_locations = db.Column(db.Text, default='[]')  # JSON array as string
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_active = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(Timestamp, default=datetime.utcnow)
+    last_active = db.Column(Timestamp, default=datetime.utcnow)
+    # Bumped on every progress change; validators for conditional GETs
+    progress_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     scan_events = db.relationship('ScanEvent', backref='user', lazy=True)
+    # Per-step progress keyed by step id, so membership checks are dict lookups
+    progress = db.relationship('UserStepProgress', lazy=True,
+                               collection_class=attribute_keyed_dict('step_id'),
+                               cascade='all, delete-orphan')
     
-    def __init__(self, email=None, phone=None):
+    def __init__(self, email=None, phone=None, hunt_id=DEFAULT_HUNT_ID):
         self.email = email
         self.phone = phone
+        self.hunt_id = hunt_id
         self.current_step = 1
-        self.completed_steps = '[]'
-        self.revealed_locations = '[]'
+        self.progress_version = 0
         self.created_at = datetime.utcnow()
         self.last_active = datetime.utcnow()
     
     def to_dict(self):
-        import json
         return {
             'id': self.id,
             'email': self.email,
             'phone': self.phone,
+            'hunt_id': self.hunt_id,
             'current_step': self.current_step,
-            'completed_steps': json.loads(self.completed_steps),
-            'revealed_locations': json.loads(self.revealed_locations),
+            'completed_steps': self.get_completed_steps(),
+            'revealed_locations': self.get_revealed_locations(),
             'created_at': self.created_at.isoformat(),
             'last_active': self.last_active.isoformat()
         }
     
+    def _progress_for(self, step_id):
+        entry = self.progress.get(step_id)
+        if entry is None:
+            entry = UserStepProgress(step_id=step_id)
+            self.progress[step_id] = entry
+        return entry
+    
+    def bump_progress_version(self):
+        # Incremented in SQL so concurrent requests cannot lose an update;
+        # rows not inserted yet just count up locally
+        if inspect(self).persistent:
+            self.progress_version = User.progress_version + 1
+        else:
+            self.progress_version = (self.progress_version or 0) + 1
+    
     def add_completed_step(self, step_id):
-        import json
-        completed = json.loads(self.completed_steps)
-        if step_id not in completed:
-            completed.append(step_id)
-            self.completed_steps = json.dumps(completed)
+        entry = self._progress_for(step_id)
+        if entry.completed_at is None:
+            entry.completed_at = datetime.utcnow()
+            self.bump_progress_version()
     
     def add_revealed_location(self, step_id):
-        import json
-        revealed = json.loads(self.revealed_locations)
-        if step_id not in revealed:
-            revealed.append(step_id)
-            self.revealed_locations = json.dumps(revealed)
+        entry = self._progress_for(step_id)
+        if entry.revealed_at is None:
+            entry.revealed_at = datetime.utcnow()
+            self.bump_progress_version()
+    
+    def has_completed_step(self, step_id):
+        entry = self.progress.get(step_id)
+        return entry is not None and entry.completed_at is not None
+    
+    def has_revealed_location(self, step_id):
+        entry = self.progress.get(step_id)
+        return entry is not None and entry.revealed_at is not None
     
     def get_completed_steps(self):
-        import json
-        return json.loads(self.completed_steps)
+        # Ordered by completion time, matching the old append-only JSON array
+        return steps_in_order(self.progress.values(), 'completed_at')
     
     def get_revealed_locations(self):
-        import json
-        return json.loads(self.revealed_locations)
-
+        return steps_in_order(self.progress.values(), 'revealed_at')
+    
+    def reset_progress(self):
+        self.progress.clear()
+        self.bump_progress_version()
+    
+    def enroll(self, hunt_id):
+        # Joining another hunt starts it from the first step
+        self.hunt_id = hunt_id
+        self.current_step = 1
+        self.reset_progress()
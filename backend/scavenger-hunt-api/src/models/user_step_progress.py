@@ -0,0 +1,33 @@
+from src.models.database import db, Timestamp
+
+class UserStepProgress(db.Model):
+    __tablename__ = 'user_step_progress'
+    __table_args__ = (
+        # Per-step aggregates for the admin dashboard
+        db.Index('ix_user_step_progress_step', 'step_id', 'completed_at', 'revealed_at'),
+    )
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    step_id = db.Column(db.Integer, db.ForeignKey('scavenger_steps.id'), primary_key=True)
+    completed_at = db.Column(Timestamp, nullable=True)
+    revealed_at = db.Column(Timestamp, nullable=True)
+    
+    def __init__(self, step_id, user_id=None, completed_at=None, revealed_at=None):
+        self.user_id = user_id
+        self.step_id = step_id
+        self.completed_at = completed_at
+        self.revealed_at = revealed_at
+    
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'step_id': self.step_id,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'revealed_at': self.revealed_at.isoformat() if self.revealed_at else None
+        }
+
+def steps_in_order(entries, field):
+    # Step ids whose completed_at/revealed_at is set, oldest first; works on
+    # model instances and plain result rows alike
+    stamped = [(getattr(e, field), e.step_id) for e in entries if getattr(e, field) is not None]
+    return [step_id for _, step_id in sorted(stamped)]
@@ -1,10 +1,25 @@
 from flask import Blueprint, request, jsonify, Response
+from sqlalchemy import select, func, and_, or_
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.exc import IntegrityError
 from src.models.database import db
 from src.models.user import User
 from src.models.scavenger_step import ScavengerStep
+from src.models.hunt import Hunt, HuntStep
 from src.models.scan_event import ScanEvent
 from src.models.admin_user import AdminUser
 from src.routes.auth import verify_token
+from src.services.stats import compute_hunt_stats
+from src.services.step_catalog import get_step_catalog, invalidate_step_catalog
+from src.services.auth_cache import principal_cache
+from src.services.scan_writer import scan_event_writer
+from src.services.event_bus import event_bus
+from src.services.conditional_get import digest, version_etag, is_not_modified, not_modified, with_etag
+from src.services.pagination import PaginationError, parse_page_size, parse_timestamp, encode_cursor, decode_cursor
+from src.services.profiling import (
+    sampling_profiler, memory_tracer, collapsed, speedscope, ProfilerBusy,
+    DEFAULT_PROFILE_SECONDS, MAX_PROFILE_SECONDS, DEFAULT_INTERVAL_MS, MIN_INTERVAL_MS
+)
 import json
 import datetime
 
@@ -22,7 +37,7 @@ def require_admin_auth(f):
         if not payload or not payload.get('is_admin'):
             return jsonify({'error': 'Admin access required'}), 403
         
-        admin = AdminUser.query.get(payload['user_id'])
+        admin = principal_cache.load(AdminUser, payload['user_id'])
         if not admin:
             return jsonify({'error': 'Admin not found'}), 404
         
@@ -35,30 +50,82 @@ def require_admin_auth(f):
 @require_admin_auth
 def get_users(admin):
     try:
-        users = User.query.order_by(User.created_at.desc()).all()
-        users_data = []
+        limit = parse_page_size(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        
+        # Keyset page of users, newest first
+        page = db.session.query(User.id).order_by(User.created_at.desc(), User.id.desc())
+        if cursor:
+            created_at, user_id = decode_cursor(cursor)
+            page = page.filter(or_(
+                User.created_at < created_at,
+                and_(User.created_at == created_at, User.id < user_id)
+            ))
+        page_ids = select(page.limit(limit + 1).subquery().c.id)
+        
+        # Validator from the page's own versions plus its users' scan history,
+        # both read from indexes, before the heavier query below
+        page_versions = (
+            db.session.query(User.id, User.progress_version, User.last_active)
+            .filter(User.id.in_(page_ids))
+            .order_by(User.id)
+            .all()
+        )
+        scans = (
+            db.session.query(func.count(ScanEvent.id), func.max(ScanEvent.scanned_at))
+            .filter(ScanEvent.user_id.in_([user_id for user_id, _, _ in page_versions]))
+            .one()
+        )
+        catalog = get_step_catalog()
+        etag = version_etag('users', digest(request.query_string, page_versions, scans, catalog.fingerprint))
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        # Latest scan per user on the page, ranked with a window function
+        ranked = db.session.query(
+            ScanEvent,
+            func.row_number().over(
+                partition_by=ScanEvent.user_id,
+                order_by=(ScanEvent.scanned_at.desc(), ScanEvent.id.desc())
+            ).label('rank')
+        ).filter(ScanEvent.user_id.in_(page_ids)).subquery()
+        latest_scan = aliased(ScanEvent, ranked)
+        
+        rows = (
+            db.session.query(User, latest_scan)
+            .outerjoin(latest_scan, and_(latest_scan.user_id == User.id, ranked.c.rank == 1))
+            .filter(User.id.in_(page_ids))
+            .options(selectinload(User.progress))
+            .order_by(User.created_at.desc(), User.id.desc())
+            .all()
+        )
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_user = rows[-1][0]
+            next_cursor = encode_cursor(last_user.created_at, last_user.id)
         
-        for user in users:
+        users_data = []
+        for user, scan in rows:
             user_data = user.to_dict()
-            
-            # Add additional stats
-            completed_count = len(user.get_completed_steps())
-            revealed_count = len(user.get_revealed_locations())
-            
-            # Get latest scan event
-            latest_scan = ScanEvent.query.filter_by(user_id=user.id).order_by(ScanEvent.scanned_at.desc()).first()
+            completed_count = len(user_data['completed_steps'])
+            total_steps = catalog.total_steps(user.hunt_id)
             
             user_data.update({
                 'completed_count': completed_count,
-                'revealed_count': revealed_count,
-                'latest_scan': latest_scan.to_dict() if latest_scan else None,
-                'progress_percentage': round((completed_count / 13) * 100, 1)
+                'revealed_count': len(user_data['revealed_locations']),
+                'latest_scan': scan.to_dict() if scan else None,
+                'total_steps': total_steps,
+                'progress_percentage': round((completed_count / total_steps) * 100, 1) if total_steps else 0
             })
             
             users_data.append(user_data)
         
-        return jsonify({'users': users_data}), 200
-        
+        return with_etag((jsonify({'users': users_data, 'next_cursor': next_cursor}), 200), etag)
+    
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -70,38 +137,66 @@ def get_events(admin):
         user_id = request.args.get('user_id')
         step_id = request.args.get('step_id')
         success_only = request.args.get('success_only', 'false').lower() == 'true'
-        limit = int(request.args.get('limit', 100))
-        
-        # Build query
-        query = ScanEvent.query
+        since = request.args.get('since')
+        cursor = request.args.get('cursor')
+        limit = parse_page_size(request.args.get('limit'))
+        
+        # Build query, resolving user details in the same statement;
+        # step names come from the in-process step catalog
+        query = (
+            db.session.query(ScanEvent, User.email, User.phone)
+            .outerjoin(User, User.id == ScanEvent.user_id)
+        )
         
         if user_id:
-            query = query.filter_by(user_id=user_id)
+            query = query.filter(ScanEvent.user_id == user_id)
         if step_id:
-            query = query.filter_by(step_id=int(step_id))
+            query = query.filter(ScanEvent.step_id == int(step_id))
         if success_only:
-            query = query.filter_by(success=True)
-        
-        events = query.order_by(ScanEvent.scanned_at.desc()).limit(limit).all()
+            query = query.filter(ScanEvent.success == True)
+        if since:
+            # Only events newer than the last one the client has seen
+            query = query.filter(ScanEvent.scanned_at > parse_timestamp(since))
+        if cursor:
+            scanned_at, event_id = decode_cursor(cursor)
+            query = query.filter(or_(
+                ScanEvent.scanned_at < scanned_at,
+                and_(ScanEvent.scanned_at == scanned_at, ScanEvent.id < event_id)
+            ))
+        
+        query = query.order_by(ScanEvent.scanned_at.desc(), ScanEvent.id.desc())
+        
+        # Scan events are never updated, so a page only changes when a newer
+        # matching event arrives (or step names change)
+        catalog = get_step_catalog()
+        newest = query.with_entities(ScanEvent.scanned_at, ScanEvent.id).first()
+        etag = version_etag('events', digest(request.query_string, newest, catalog.fingerprint))
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        rows = query.limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_event = rows[-1][0]
+            next_cursor = encode_cursor(last_event.scanned_at, last_event.id)
         
         events_data = []
-        for event in events:
+        for event, user_email, user_phone in rows:
+            step = catalog.get(event.step_id)
             event_data = event.to_dict()
-            
-            # Add user and step info
-            user = User.query.get(event.user_id)
-            step = ScavengerStep.query.get(event.step_id)
-            
             event_data.update({
-                'user_email': user.email if user else None,
-                'user_phone': user.phone if user else None,
+                'user_email': user_email,
+                'user_phone': user_phone,
                 'step_name': step.name if step else None
             })
-            
             events_data.append(event_data)
         
-        return jsonify({'events': events_data}), 200
-        
+        return with_etag((jsonify({'events': events_data, 'next_cursor': next_cursor}), 200), etag)
+    
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -115,17 +210,17 @@ def reset_user_progress(admin, user_id):
         
         # Reset user progress
         user.current_step = 1
-        user.completed_steps = '[]'
-        user.revealed_locations = '[]'
+        user.reset_progress()
         user.last_active = datetime.datetime.utcnow()
         
         db.session.commit()
+        principal_cache.evict(User, user.id)
         
         return jsonify({
             'message': 'User progress reset successfully',
             'user': user.to_dict()
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -138,30 +233,34 @@ def skip_step(admin, user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        if user.current_step >= 13:
+        catalog = get_step_catalog()
+        if user.current_step >= catalog.total_steps(user.hunt_id):
             return jsonify({'error': 'User has already completed all steps'}), 400
+        step = catalog.step_at(user.hunt_id, user.current_step)
+        if not step:
+            return jsonify({'error': 'Step not found'}), 404
         
         # Mark current step as completed and move to next
-        user.add_completed_step(user.current_step)
+        user.add_completed_step(step.id)
         user.current_step += 1
         user.last_active = datetime.datetime.utcnow()
         
         # Log admin action as scan event
-        scan_event = ScanEvent(
+        scan_event_writer.record(
             user_id=user.id,
-            step_id=user.current_step - 1,
+            step_id=step.id,
             success=True,
             revealed_first=False
         )
-        db.session.add(scan_event)
         
         db.session.commit()
+        principal_cache.evict(User, user.id)
         
         return jsonify({
             'message': 'Step skipped successfully',
             'user': user.to_dict()
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -183,12 +282,73 @@ def update_step(admin, step_id):
             step.qr_code_value = data['qr_code_value']
         
         db.session.commit()
+        invalidate_step_catalog()
         
         return jsonify({
             'message': 'Step updated successfully',
             'step': step.to_dict()
         }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/hunts', methods=['GET'])
+@require_admin_auth
+def get_hunts(admin):
+    try:
+        hunts = Hunt.query.order_by(Hunt.id).all()
+        return jsonify({'hunts': [hunt.to_dict() for hunt in hunts]}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/hunts', methods=['POST'])
+@require_admin_auth
+def create_hunt(admin):
+    try:
+        data = request.get_json()
+        slug = data.get('slug')
+        name = data.get('name')
+        steps = data.get('steps') or []
+        
+        if not slug or not name:
+            return jsonify({'error': 'Slug and name required'}), 400
+        fields = ('name', 'clue', 'qr_code_value')
+        if not steps or any(not all(step.get(field) for field in fields) for step in steps):
+            return jsonify({'error': 'Each step needs a name, clue and qr_code_value'}), 400
+        
+        # Numbered explicitly like the steps below: the default hunt is seeded
+        # with id 1, so a PostgreSQL sequence would hand out 1 again
+        hunt_id = (db.session.query(func.max(Hunt.id)).scalar() or 0) + 1
+        hunt = Hunt(slug=slug, name=name, city=data.get('city'), is_active=data.get('is_active', True), id=hunt_id)
+        db.session.add(hunt)
+        
+        # Steps are numbered after the existing ones and placed in the order given
+        next_id = (db.session.query(func.max(ScavengerStep.id)).scalar() or 0) + 1
+        for offset, step_data in enumerate(steps):
+            db.session.add(ScavengerStep(
+                id=next_id + offset,
+                name=step_data['name'],
+                clue=step_data['clue'],
+                qr_code_url=step_data.get('qr_code_url'),
+                qr_code_value=step_data['qr_code_value']
+            ))
+        db.session.flush()
+        for offset in range(len(steps)):
+            db.session.add(HuntStep(hunt_id=hunt.id, position=offset + 1, step_id=next_id + offset))
         
+        db.session.commit()
+        invalidate_step_catalog()
+        
+        return jsonify({
+            'message': 'Hunt created successfully',
+            'hunt': hunt.to_dict()
+        }), 201
+    
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Hunt slug or QR code value already in use'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -197,64 +357,123 @@ def update_step(admin, step_id):
 @require_admin_auth
 def get_stats(admin):
     try:
-        # Get overall statistics
-        total_users = User.query.count()
-        total_scans = ScanEvent.query.count()
-        successful_scans = ScanEvent.query.filter_by(success=True).count()
-        
-        # Users who completed the hunt
-        completed_users = 0
-        for user in User.query.all():
-            if len(user.get_completed_steps()) >= 13:
-                completed_users += 1
-        
-        # Step completion rates
-        step_stats = []
-        for i in range(1, 14):
-            step = ScavengerStep.query.get(i)
-            if step:
-                completed_count = 0
-                revealed_count = 0
-                
-                for user in User.query.all():
-                    completed_steps = user.get_completed_steps()
-                    revealed_locations = user.get_revealed_locations()
-                    
-                    if i in completed_steps:
-                        completed_count += 1
-                    if i in revealed_locations:
-                        revealed_count += 1
-                
-                step_stats.append({
-                    'step_id': i,
-                    'step_name': step.name,
-                    'completed_count': completed_count,
-                    'revealed_count': revealed_count,
-                    'completion_rate': round((completed_count / total_users * 100), 1) if total_users > 0 else 0
-                })
-        
-        return jsonify({
-            'total_users': total_users,
-            'total_scans': total_scans,
-            'successful_scans': successful_scans,
-            'completed_users': completed_users,
-            'completion_rate': round((completed_users / total_users * 100), 1) if total_users > 0 else 0,
-            'step_stats': step_stats
-        }), 200
-        
+        hunt_id = request.args.get('hunt_id', type=int)
+        if hunt_id is not None and not get_step_catalog().get_hunt(hunt_id):
+            return jsonify({'error': 'Hunt not found'}), 404
+        return jsonify(compute_hunt_stats(hunt_id)), 200
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/notifications/stream', methods=['GET'])
 @require_admin_auth
 def notification_stream(admin):
+    # Resume after the last event the client saw, if it is still in history
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    subscription = event_bus.subscribe(last_event_id)
+    
     def generate():
-        # This is a simple implementation - in production, you'd use Redis or similar
-        # For now, we'll just send a heartbeat every 30 seconds
-        while True:
-            yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': datetime.datetime.utcnow().isoformat()})}\n\n"
-            import time
-            time.sleep(30)
+        try:
+            while True:
+                events = subscription.wait(timeout=30)
+                if subscription.dropped:
+                    # Too far behind; the id makes the client reconnect from the
+                    # newest event instead of replaying what it missed again
+                    resume = f'id: {subscription.last_id}\n' if subscription.last_id is not None else ''
+                    yield f"{resume}data: {json.dumps({'type': 'dropped', 'timestamp': datetime.datetime.utcnow().isoformat()})}\n\n"
+                    return
+                if not events:
+                    yield f"data: {json.dumps({'type': 'heartbeat', 'timestamp': datetime.datetime.utcnow().isoformat()})}\n\n"
+                for event in events:
+                    yield f"id: {event.id}\ndata: {json.dumps(dict(event.data, type=event.type))}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@admin_bp.route('/profile/cpu', methods=['POST'])
+@require_admin_auth
+def profile_cpu(admin):
+    # Samples this worker's request threads for `seconds`, or until `requests`
+    # other requests have finished, and answers when done. Other workers are
+    # not profiled; repeat the call to reach them.
+    try:
+        data = request.get_json(silent=True) or {}
+        seconds = float(data.get('seconds', DEFAULT_PROFILE_SECONDS))
+        max_requests = int(data['requests']) if data.get('requests') else None
+        interval_ms = float(data.get('interval_ms', DEFAULT_INTERVAL_MS))
+        output = data.get('format', 'collapsed')
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds, requests and interval_ms must be numbers'}), 400
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {MAX_PROFILE_SECONDS}'}), 400
+    if interval_ms < MIN_INTERVAL_MS or (max_requests is not None and max_requests < 1):
+        return jsonify({'error': f'interval_ms must be at least {MIN_INTERVAL_MS} and requests at least 1'}), 400
+    if output not in ('collapsed', 'speedscope'):
+        return jsonify({'error': 'format must be collapsed or speedscope'}), 400
+    
+    try:
+        result = sampling_profiler.profile(seconds, max_requests, interval_ms, bool(data.get('all_threads')))
+    except ProfilerBusy as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    headers = {
+        'X-Profile-Samples': str(result.samples),
+        'X-Profile-Requests': str(result.requests),
+        'X-Profile-Seconds': f'{result.seconds:.2f}'
+    }
+    if output == 'speedscope':
+        return jsonify(speedscope(result)), 200, headers
+    return Response(collapsed(result), mimetype='text/plain', headers=headers)
+
+@admin_bp.route('/profile/memory/start', methods=['POST'])
+@require_admin_auth
+def start_memory_tracing(admin):
+    try:
+        data = request.get_json(silent=True) or {}
+        frames = int(data.get('frames', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'frames must be a number'}), 400
+    if not 1 <= frames <= 64:
+        return jsonify({'error': 'frames must be between 1 and 64'}), 400
     
-    return Response(generate(), mimetype='text/event-stream')
+    try:
+        memory_tracer.start(frames)
+        return jsonify({'message': 'Memory tracing started', 'frames': frames}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
+@admin_bp.route('/profile/memory', methods=['GET'])
+@require_admin_auth
+def memory_snapshot(admin):
+    limit = request.args.get('limit', 20, type=int)
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': 'group_by must be lineno, filename or traceback'}), 400
+    
+    try:
+        snapshot = memory_tracer.snapshot(max(1, limit), group_by)
+        if snapshot is None:
+            return jsonify({'error': 'Memory tracing is not running; POST /profile/memory/start first'}), 409
+        return jsonify(snapshot), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/profile/memory/stop', methods=['POST'])
+@require_admin_auth
+def stop_memory_tracing(admin):
+    try:
+        memory_tracer.stop()
+        return jsonify({'message': 'Memory tracing stopped'}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
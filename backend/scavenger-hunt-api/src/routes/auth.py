@@ -3,8 +3,17 @@ from werkzeug.security import check_password_hash
 from src.models.database import db
 from src.models.user import User
 from src.models.admin_user import AdminUser
+from src.models.hunt import DEFAULT_HUNT_ID
+from src.services.auth_cache import token_cache, principal_cache
+from src.services.event_bus import event_bus
+from src.services.step_catalog import get_step_catalog, parse_hunt_id
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 import jwt
 import datetime
+import uuid
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -20,14 +29,61 @@ def generate_token(user_id, is_admin=False):
     return jwt.encode(payload, JWT_SECRET, algorithm='HS256')
 
 def verify_token(token):
+    # Verified payloads are cached until their exp, skipping the HMAC check
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        token_cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def upsert_login_user(field, value, hunt_id=DEFAULT_HUNT_ID):
+    # INSERT ... ON CONFLICT DO UPDATE ... RETURNING where the backend supports
+    # it, so concurrent first logins with the same email/phone cannot race into
+    # the unique constraint. hunt_id only applies to new users. The caller commits.
+    now = datetime.datetime.utcnow()
+    values = {
+        'id': str(uuid.uuid4()),
+        field: value,
+        'hunt_id': hunt_id,
+        'current_step': 1,
+        'created_at': now,
+        'last_active': now
+    }
+    dialect = db.session.get_bind().dialect
+    
+    if dialect.name in ('sqlite', 'postgresql') and dialect.insert_returning:
+        insert = sqlite_insert if dialect.name == 'sqlite' else postgresql_insert
+        stmt = (
+            insert(User).values(**values)
+            .on_conflict_do_update(index_elements=[field], set_={'last_active': now})
+            .returning(User)
+        )
+        return db.session.scalars(stmt, execution_options={'populate_existing': True}).one()
+    
+    if dialect.name == 'mysql':
+        # MySQL has no RETURNING, so read the row back after the upsert
+        db.session.execute(mysql_insert(User).values(**values).on_duplicate_key_update(last_active=now))
+        return User.query.filter_by(**{field: value}).populate_existing().one()
+    
+    # Portable fallback (e.g. SQLite older than 3.35): select, then insert and
+    # re-read if a concurrent login won the race
+    user = User.query.filter_by(**{field: value}).first()
+    if not user:
+        try:
+            with db.session.begin_nested():
+                user = User(hunt_id=hunt_id, **{field: value})
+                db.session.add(user)
+        except IntegrityError:
+            user = User.query.filter_by(**{field: value}).one()
+    user.last_active = now
+    return user
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
@@ -38,34 +94,38 @@ def login():
         if not email and not phone:
             return jsonify({'error': 'Email or phone number required'}), 400
         
-        # Find or create user
-        user = None
-        if email:
-            user = User.query.filter_by(email=email).first()
-            if not user:
-                user = User(email=email)
-                db.session.add(user)
-                db.session.commit()
-        elif phone:
-            user = User.query.filter_by(phone=phone).first()
-            if not user:
-                user = User(phone=phone)
-                db.session.add(user)
-                db.session.commit()
+        # New users may pick a hunt; returning users switch with /hunt/enroll
+        hunt_id = data.get('hunt_id')
+        if hunt_id is None:
+            hunt_id = DEFAULT_HUNT_ID
+        else:
+            hunt_id = parse_hunt_id(hunt_id)
+            if hunt_id is None:
+                return jsonify({'error': 'Invalid hunt ID'}), 400
+            hunt = get_step_catalog().get_hunt(hunt_id)
+            if not hunt or not hunt.is_active:
+                return jsonify({'error': 'Hunt not found'}), 404
         
-        # Update last active
-        user.last_active = datetime.datetime.utcnow()
+        # Find or create user and touch last_active in one statement
+        if email:
+            user = upsert_login_user('email', email, hunt_id)
+        else:
+            user = upsert_login_user('phone', phone, hunt_id)
+        user_data = user.to_dict()
         db.session.commit()
         
+        event_bus.publish('login', user_id=user_data['id'], email=user_data['email'], phone=user_data['phone'])
+        
         # Generate token
-        token = generate_token(user.id)
+        token = generate_token(user_data['id'])
         
         return jsonify({
             'token': token,
-            'user': user.to_dict()
+            'user': user_data
         }), 200
-        
+    
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/admin-login', methods=['POST'])
@@ -90,7 +150,7 @@ def admin_login():
             'token': token,
             'admin': admin.to_dict()
         }), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -108,16 +168,16 @@ def get_current_user():
             return jsonify({'error': 'Invalid token'}), 401
         
         if payload.get('is_admin'):
-            admin = AdminUser.query.get(payload['user_id'])
+            admin = principal_cache.load(AdminUser, payload['user_id'])
             if not admin:
                 return jsonify({'error': 'Admin not found'}), 404
             return jsonify({'admin': admin.to_dict()}), 200
         else:
-            user = User.query.get(payload['user_id'])
+            user = principal_cache.load(User, payload['user_id'])
             if not user:
                 return jsonify({'error': 'User not found'}), 404
             return jsonify({'user': user.to_dict()}), 200
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1,9 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import select, update, insert, case
+from sqlalchemy.exc import IntegrityError
 from src.models.database import db
 from src.models.user import User
-from src.models.scavenger_step import ScavengerStep
-from src.models.scan_event import ScanEvent
+from src.models.user_step_progress import UserStepProgress
 from src.routes.auth import verify_token
+from src.services.step_catalog import get_step_catalog, parse_hunt_id
+from src.services.auth_cache import principal_cache
+from src.services.scan_writer import scan_event_writer
+from src.services.event_bus import event_bus
+from src.services.progress_cache import progress_cache
+from src.services.conditional_get import version_etag, is_not_modified, not_modified, with_etag
 import datetime
 
 hunt_bp = Blueprint('hunt', __name__)
@@ -20,7 +27,7 @@ def require_auth(f):
         if not payload or payload.get('is_admin'):
             return jsonify({'error': 'Invalid token'}), 401
         
-        user = User.query.get(payload['user_id'])
+        user = principal_cache.load(User, payload['user_id'])
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -29,33 +36,164 @@ def require_auth(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def advance_step(user_id, step, total_steps):
+    # Compare-and-advance: move the user past step only if they are still on
+    # it (same hunt and position) and have not completed it yet, in one
+    # conditional UPDATE. Returns whether this call won the advance. The
+    # caller commits.
+    now = datetime.datetime.utcnow()
+    step_id = step.id
+    already_completed = (
+        select(UserStepProgress.step_id)
+        .where(UserStepProgress.user_id == user_id,
+               UserStepProgress.step_id == step_id,
+               UserStepProgress.completed_at.isnot(None))
+        .exists()
+    )
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.hunt_id == step.hunt_id, User.current_step == step.position,
+               ~already_completed)
+        .values(
+            current_step=case((User.current_step < total_steps, User.current_step + 1), else_=User.current_step),
+            progress_version=User.progress_version + 1,
+            last_active=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return False
+    
+    # Mark the step as completed, keeping any earlier reveal timestamp
+    marked = db.session.execute(
+        update(UserStepProgress)
+        .where(UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id)
+        .values(completed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if marked.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(UserStepProgress).values(user_id=user_id, step_id=step_id,
+                                                                   completed_at=now))
+        except IntegrityError:
+            # A concurrent reveal inserted the row first; mark that one instead
+            db.session.execute(
+                update(UserStepProgress)
+                .where(UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id)
+                .values(completed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+    return True
+
+def mark_revealed(user_id, step_id):
+    # Sets revealed_at on an existing progress row, keeping an earlier reveal.
+    # Returns whether this call revealed the step. The caller commits.
+    now = datetime.datetime.utcnow()
+    marked = db.session.execute(
+        update(UserStepProgress)
+        .where(UserStepProgress.user_id == user_id, UserStepProgress.step_id == step_id,
+               UserStepProgress.revealed_at.is_(None))
+        .values(revealed_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if marked.rowcount != 1:
+        return False
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(progress_version=User.progress_version + 1, last_active=now)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+def progress_etag(view, user_id, progress_version, hunt):
+    # Changes whenever the user's progress or their hunt's steps do
+    return version_etag(view, user_id, progress_version, hunt.fingerprint)
+
+def cached_progress_response(view, user, hunt, etag, build):
+    # Pre-encoded body from the progress cache; rebuilt only after the user's
+    # progress or their hunt's steps change
+    version = (user.progress_version, hunt.fingerprint)
+    body = progress_cache.get(view, user.id, version)
+    if body is None:
+        body = jsonify(build()).get_data()
+        progress_cache.put(view, user.id, version, body)
+    return with_etag((current_app.response_class(body, mimetype='application/json'), 200), etag)
+
+def current_step_payload(hunt, step, current, completed_steps, revealed_locations):
+    # Progress is reported by position within the hunt, like current
+    completed_steps = hunt.positions(completed_steps)
+    
+    # Check if user has completed all steps
+    if len(completed_steps) >= hunt.total_steps:
+        return {
+            'completed': True,
+            'message': 'Congratulations! You have completed the scavenger hunt!'
+        }
+    
+    return {
+        'step': step.to_dict_for_user(),
+        'progress': {
+            'current': current,
+            'total': hunt.total_steps,
+            'completed_steps': completed_steps,
+            'revealed_locations': hunt.positions(revealed_locations)
+        }
+    }
+
+def progress_payload(hunt, current, completed_steps, revealed_locations):
+    completed = set(completed_steps)
+    revealed = set(revealed_locations)
+    
+    # Get all steps of the user's hunt for progress display
+    steps_info = []
+    for step in hunt.steps:
+        step_info = {
+            'id': step.id,
+            'name': step.name,
+            'completed': step.id in completed,
+            'revealed': step.id in revealed,
+            'current': step.position == current
+        }
+        
+        # Only show clue for current step or completed steps
+        if step.position == current or step.id in completed:
+            step_info['clue'] = step.clue
+        
+        steps_info.append(step_info)
+    
+    completed_count = len(hunt.positions(completed_steps))
+    return {
+        'current_step': current,
+        'total_steps': hunt.total_steps,
+        'completed_count': completed_count,
+        'steps': steps_info,
+        'completed_hunt': completed_count >= hunt.total_steps
+    }
+
 @hunt_bp.route('/current-step', methods=['GET'])
 @require_auth
 def get_current_step(user):
     try:
         # Get current step
-        current_step = ScavengerStep.query.get(user.current_step)
+        catalog = get_step_catalog()
+        hunt = catalog.get_hunt(user.hunt_id)
+        if not hunt:
+            return jsonify({'error': 'Hunt not found'}), 404
+        current_step = catalog.step_at(hunt.id, user.current_step)
         if not current_step:
             return jsonify({'error': 'Step not found'}), 404
         
-        # Check if user has completed all steps
-        completed_steps = user.get_completed_steps()
-        if len(completed_steps) >= 13:
-            return jsonify({
-                'completed': True,
-                'message': 'Congratulations! You have completed the scavenger hunt!'
-            }), 200
-        
-        return jsonify({
-            'step': current_step.to_dict_for_user(),
-            'progress': {
-                'current': user.current_step,
-                'total': 13,
-                'completed_steps': completed_steps,
-                'revealed_locations': user.get_revealed_locations()
-            }
-        }), 200
+        # Unchanged since the client's last poll: skip loading progress
+        etag = progress_etag('current-step', user.id, user.progress_version, hunt)
+        if is_not_modified(etag):
+            return not_modified(etag)
         
+        return cached_progress_response('current-step', user, hunt, etag, lambda: current_step_payload(
+            hunt, current_step, user.current_step, user.get_completed_steps(), user.get_revealed_locations()
+        ))
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -70,59 +208,79 @@ def scan_qr(user):
             return jsonify({'error': 'QR value required'}), 400
         
         # Get current step
-        current_step = ScavengerStep.query.get(user.current_step)
+        catalog = get_step_catalog()
+        user_id = user.id
+        hunt = catalog.get_hunt(user.hunt_id)
+        if not hunt:
+            return jsonify({'error': 'Hunt not found'}), 404
+        position = user.current_step
+        current_step = catalog.step_at(hunt.id, position)
         if not current_step:
             return jsonify({'error': 'Current step not found'}), 404
+        step_id = current_step.id
         
-        # Check if QR code matches current step
-        success = qr_value == current_step.qr_code_value
+        # Check if QR code matches current step; codes from other hunts never match
+        scanned_step = catalog.find_by_qr_code(hunt.id, qr_value)
+        success = scanned_step is not None and scanned_step.position == position
+        
+        if (not success and scanned_step is not None and scanned_step.position < position
+                and user.has_completed_step(scanned_step.id)):
+            # A retry of a scan that already advanced the user (e.g. after a
+            # slow response): answer as before without logging another event
+            return jsonify({
+                'success': True,
+                'advanced': False,
+                'message': 'Step already completed.',
+                'next_step': current_step.to_dict_for_user(),
+                'completed_hunt': user.has_completed_step(step_id)
+            }), 200
         
         # Check if user revealed location first
-        revealed_locations = user.get_revealed_locations()
-        revealed_first = user.current_step in revealed_locations
+        revealed_first = user.has_revealed_location(step_id)
         
-        # Log scan event
-        scan_event = ScanEvent(
-            user_id=user.id,
-            step_id=user.current_step,
+        # Log scan event (in async mode queued for a background batch insert once
+        # this request commits)
+        scan_event_writer.record(
+            user_id=user_id,
+            step_id=step_id,
             success=success,
             revealed_first=revealed_first
         )
-        db.session.add(scan_event)
         
         if success:
-            # Mark step as completed
-            user.add_completed_step(user.current_step)
-            
-            # Move to next step if not the last one
-            if user.current_step < 13:
-                user.current_step += 1
-            
-            # Update last active
-            user.last_active = datetime.datetime.utcnow()
-            
+            # Only one of several concurrent scans of this step advances the user
+            advanced = advance_step(user_id, current_step, hunt.total_steps)
             db.session.commit()
+            if advanced:
+                principal_cache.evict(User, user_id)
+            finished = position >= hunt.total_steps
+            event_bus.publish('scan', user_id=user_id, hunt_id=hunt.id, step_id=step_id, success=True,
+                              advanced=advanced)
+            if advanced and finished:
+                event_bus.publish('completion', user_id=user_id, hunt_id=hunt.id)
             
             # Get next step info
             next_step = None
-            if user.current_step <= 13:
-                next_step_obj = ScavengerStep.query.get(user.current_step)
-                if next_step_obj:
-                    next_step = next_step_obj.to_dict_for_user()
+            next_step_obj = catalog.step_at(hunt.id, position + 1 if not finished else position)
+            if next_step_obj:
+                next_step = next_step_obj.to_dict_for_user()
             
             return jsonify({
                 'success': True,
-                'message': 'Correct! Moving to next clue.',
+                'advanced': advanced,
+                'message': 'Correct! Moving to next clue.' if advanced else 'Step already completed.',
                 'next_step': next_step,
-                'completed_hunt': user.current_step > 13
+                'completed_hunt': finished
             }), 200
         else:
             db.session.commit()
+            event_bus.publish('scan', user_id=user_id, hunt_id=hunt.id, step_id=step_id, success=False,
+                              advanced=False)
             return jsonify({
                 'success': False,
                 'message': 'Wrong location – try again!'
             }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -131,22 +289,33 @@ def scan_qr(user):
 @require_auth
 def reveal_location(user):
     try:
-        # Add current step to revealed locations
-        user.add_revealed_location(user.current_step)
-        user.last_active = datetime.datetime.utcnow()
-        db.session.commit()
-        
-        # Get current step with location revealed
-        current_step = ScavengerStep.query.get(user.current_step)
+        current_step = get_step_catalog().step_at(user.hunt_id, user.current_step)
         if not current_step:
             return jsonify({'error': 'Step not found'}), 404
         
+        # Add current step to revealed locations
+        user_id = user.id
+        user.add_revealed_location(current_step.id)
+        user.last_active = datetime.datetime.utcnow()
+        try:
+            db.session.commit()
+            revealed = True
+        except IntegrityError:
+            # A concurrent scan or reveal of the same step inserted the progress
+            # row first; mark that row revealed unless the other request did
+            db.session.rollback()
+            revealed = mark_revealed(user_id, current_step.id)
+            db.session.commit()
+        if revealed:
+            event_bus.publish('reveal', user_id=user_id, hunt_id=current_step.hunt_id, step_id=current_step.id)
+        principal_cache.evict(User, user_id)
+        
         return jsonify({
             'revealed': True,
             'location': current_step.name,
             'message': f'Location revealed: {current_step.name}'
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -155,36 +324,55 @@ def reveal_location(user):
 @require_auth
 def get_progress(user):
     try:
-        completed_steps = user.get_completed_steps()
-        revealed_locations = user.get_revealed_locations()
-        
-        # Get all steps for progress display
-        all_steps = ScavengerStep.query.order_by(ScavengerStep.id).all()
-        steps_info = []
-        
-        for step in all_steps:
-            step_info = {
-                'id': step.id,
-                'name': step.name,
-                'completed': step.id in completed_steps,
-                'revealed': step.id in revealed_locations,
-                'current': step.id == user.current_step
-            }
-            
-            # Only show clue for current step or completed steps
-            if step.id == user.current_step or step.id in completed_steps:
-                step_info['clue'] = step.clue
-            
-            steps_info.append(step_info)
+        hunt = get_step_catalog().get_hunt(user.hunt_id)
+        if not hunt:
+            return jsonify({'error': 'Hunt not found'}), 404
+        etag = progress_etag('progress', user.id, user.progress_version, hunt)
+        if is_not_modified(etag):
+            return not_modified(etag)
+        
+        return cached_progress_response('progress', user, hunt, etag, lambda: progress_payload(
+            hunt, user.current_step, user.get_completed_steps(), user.get_revealed_locations()
+        ))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@hunt_bp.route('/hunts', methods=['GET'])
+def list_hunts():
+    try:
+        # Hunts open for enrollment; no token needed so the login page can offer them
+        return jsonify({'hunts': [hunt.to_dict() for hunt in get_step_catalog().active_hunts()]}), 200
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@hunt_bp.route('/enroll', methods=['POST'])
+@require_auth
+def enroll(user):
+    try:
+        data = request.get_json()
+        hunt_id = parse_hunt_id(data.get('hunt_id'))
+        if hunt_id is None:
+            return jsonify({'error': 'Hunt ID required'}), 400
+        
+        hunt = get_step_catalog().get_hunt(hunt_id)
+        if not hunt or not hunt.is_active:
+            return jsonify({'error': 'Hunt not found'}), 404
+        
+        # Switching hunts starts the new one from its first step
+        if user.hunt_id != hunt.id:
+            user.enroll(hunt.id)
+            user.last_active = datetime.datetime.utcnow()
+            db.session.commit()
+            principal_cache.evict(User, user.id)
+            event_bus.publish('enroll', user_id=user.id, hunt_id=hunt.id)
         
         return jsonify({
-            'current_step': user.current_step,
-            'total_steps': 13,
-            'completed_count': len(completed_steps),
-            'steps': steps_info,
-            'completed_hunt': len(completed_steps) >= 13
+            'hunt': hunt.to_dict(),
+            'user': user.to_dict()
         }), 200
-        
+    
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
-
@@ -1,8 +1,15 @@
 from flask import Blueprint, jsonify
+from src.services.scan_writer import scan_event_writer
+from src.services.progress_cache import progress_cache
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'scavenger-hunt-api'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'scavenger-hunt-api',
+        'scan_event_writer': scan_event_writer.metrics(),
+        'progress_cache': progress_cache.stats()
+    }), 200
 
@@ -0,0 +1,66 @@
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from gunicorn.app.base import BaseApplication
+
+# Production launcher: python src/serve.py
+#
+# Serves src.main:app from preforked gunicorn workers. The app is imported
+# and bootstrapped once in the master before forking, so schema checks and
+# seeding run a single time and workers share the loaded code. SIGHUP
+# replaces the workers gracefully; because the app is preloaded, code
+# changes need a full restart.
+
+def server_options(environ=os.environ):
+    return {
+        'bind': environ.get('WEB_BIND', f"0.0.0.0:{environ.get('PORT', 5000)}"),
+        'workers': int(environ.get('WEB_WORKERS', (os.cpu_count() or 1) * 2 + 1)),
+        'threads': int(environ.get('WEB_THREADS', 4)),
+        'worker_class': 'gthread',
+        # Recycle workers after this many requests (0 disables), with jitter so
+        # they do not all restart at once
+        'max_requests': int(environ.get('WEB_MAX_REQUESTS', 10000)),
+        'max_requests_jitter': int(environ.get('WEB_MAX_REQUESTS_JITTER', 1000)),
+        'timeout': int(environ.get('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        'keepalive': int(environ.get('WEB_KEEPALIVE', 5)),
+        'accesslog': environ.get('WEB_ACCESS_LOG', '-') or None,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit
+    }
+
+def post_fork(server, worker):
+    # Pooled connections opened by the master during preload must not be
+    # shared with the children; give each worker a fresh pool without closing
+    # the parent's sockets
+    from src.main import app
+    from src.models.database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+def worker_exit(server, worker):
+    # Flush queued scan events before a recycled or reloaded worker exits
+    from src.services.scan_writer import scan_event_writer
+    scan_event_writer.stop()
+
+class HuntApplication(BaseApplication):
+
+    def __init__(self, options=None):
+        self.options = options or {}
+        super().__init__()
+    
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+    
+    def load(self):
+        from src.main import app, ensure_bootstrapped
+        ensure_bootstrapped(app)
+        return app
+
+if __name__ == '__main__':
+    HuntApplication(server_options()).run()
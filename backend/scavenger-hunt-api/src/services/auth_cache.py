@@ -0,0 +1,242 @@
+import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import inspect, insert, delete, func
+from sqlalchemy.orm import make_transient_to_detached
+from src.models.database import db
+from src.models.cache_eviction import CacheEviction
+
+class TokenCache:
+    # Bounded LRU of verified JWT payloads, keyed by token digest and kept
+    # until the token's own exp claim
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+    
+    def put(self, token, payload):
+        expires_at = payload.get('exp')
+        if not expires_at or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+class PrincipalCache:
+    # Short-lived cache of User/AdminUser rows behind verified tokens.
+    # Entries are detached column snapshots that get attached to the request
+    # session with merge(load=False), so a hit costs no SQL. Disabled when
+    # ttl is 0; anything that changes a cached row must call evict().
+    #
+    # evict() also records the key in cache_evictions. Every worker process
+    # applies the records of the others at most sync_interval seconds apart
+    # (0 checks before every lookup), so another process can serve a changed
+    # row for up to that long instead of until the entry's ttl runs out.
+    #
+    # Records are read by created_at, going sync_overlap seconds back past
+    # the newest one seen: ids from a sequence may commit out of order, and a
+    # record that commits late still falls in the window.
+    
+    def __init__(self, ttl=0, max_entries=10000, sync_interval=1.0, sync_overlap=5.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        self._cursor = None
+        self._applied = {}
+        self._pruned_at = 0.0
+        # Generation of each key's latest eviction, so a row read before an
+        # eviction is not cached after it. Keys that fall off the bounded map
+        # count as evicted at _forgotten.
+        self._generation = 0
+        self._evicted = OrderedDict()
+        self._forgotten = 0
+    
+    @staticmethod
+    def _snapshot(obj):
+        mapper = inspect(obj).mapper
+        copy = mapper.class_manager.new_instance()
+        for attr in mapper.column_attrs:
+            setattr(copy, attr.key, getattr(obj, attr.key))
+        make_transient_to_detached(copy)
+        return copy
+    
+    def load(self, model, principal_id):
+        if self.ttl <= 0:
+            return db.session.get(model, principal_id)
+        
+        # Keyed like the cache_evictions records (AdminUser ids are integers)
+        key = (model.__name__, str(principal_id))
+        now = time.monotonic()
+        self._sync(now)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return db.session.merge(entry[0], load=False)
+            self.misses += 1
+            started = self._generation
+        
+        obj = db.session.get(model, principal_id)
+        if obj is not None:
+            snapshot = self._snapshot(obj)
+            with self._lock:
+                if started < self._forgotten or self._evicted.get(key, 0) > started:
+                    # Evicted while the row was being read; it may predate the change
+                    return obj
+                self._entries[key] = (snapshot, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return obj
+    
+    def evict(self, model, principal_id):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._forget((model.__name__, str(principal_id)))
+        # Own transaction: callers evict after committing their change
+        with db.engine.begin() as connection:
+            connection.execute(insert(CacheEviction), {
+                'cache': model.__name__,
+                'cache_key': str(principal_id),
+                'created_at': datetime.datetime.utcnow()
+            })
+            now = time.monotonic()
+            if now >= self._pruned_at + self._retention():
+                self._pruned_at = now
+                cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self._retention())
+                connection.execute(delete(CacheEviction).where(CacheEviction.created_at < cutoff))
+    
+    def _forget(self, key):
+        # Called with the lock held
+        self._entries.pop(key, None)
+        self._generation += 1
+        self._evicted[key] = self._generation
+        self._evicted.move_to_end(key)
+        while len(self._evicted) > self.max_entries:
+            _, self._forgotten = self._evicted.popitem(last=False)
+    
+    def _retention(self):
+        # A process that synced within ttl + sync_interval only needs records
+        # younger than that plus the overlap; a minute of slack covers clock
+        # skew between hosts
+        return self.ttl + self.sync_interval + self.sync_overlap + 60
+    
+    def _sync(self, now):
+        # Drops entries that other processes evicted since the last sync
+        if self._synced_at is not None and now < self._synced_at + self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            if self._synced_at is None or now >= self._synced_at + self.ttl + self.sync_interval:
+                # First sync, or idle so long that every entry has expired and
+                # the records since then may be pruned: start from the newest,
+                # skipping the ones already in its window
+                self._cursor = db.session.query(func.max(CacheEviction.created_at)).scalar()
+                self._applied = {}
+                self.clear()
+                for record in self._window():
+                    self._applied[record.id] = record.created_at
+            else:
+                records = [record for record in self._window() if record.id not in self._applied]
+                with self._lock:
+                    for record in records:
+                        self._forget((record.cache, record.cache_key))
+                for record in records:
+                    self._applied[record.id] = record.created_at
+                    if self._cursor is None or record.created_at > self._cursor:
+                        self._cursor = record.created_at
+                if self._cursor is not None:
+                    cutoff = self._cursor - datetime.timedelta(seconds=self.sync_overlap)
+                    self._applied = {
+                        record_id: created_at for record_id, created_at in self._applied.items() if created_at >= cutoff
+                    }
+            self._synced_at = now
+        finally:
+            self._sync_lock.release()
+    
+    def _window(self):
+        query = db.session.query(CacheEviction.id, CacheEviction.cache, CacheEviction.cache_key,
+                                 CacheEviction.created_at)
+        if self._cursor is not None:
+            query = query.filter(
+                CacheEviction.created_at >= self._cursor - datetime.timedelta(seconds=self.sync_overlap)
+            )
+        return query.all()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._forgotten = self._generation
+            self._evicted.clear()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'sync_interval': self.sync_interval,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+token_cache = TokenCache()
+principal_cache = PrincipalCache()
+
+def configure_auth_caches(config):
+    token_cache.max_entries = config.get('TOKEN_CACHE_SIZE', 10000)
+    principal_cache.ttl = config.get('PRINCIPAL_CACHE_TTL', 0)
+    principal_cache.max_entries = config.get('PRINCIPAL_CACHE_SIZE', 10000)
+    principal_cache.sync_interval = config.get('PRINCIPAL_CACHE_SYNC_INTERVAL', 1.0)
@@ -0,0 +1,147 @@
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+from src.models.database import db
+from src.models.admin_user import AdminUser
+from src.models.scavenger_step import ScavengerStep
+from src.models.hunt import Hunt, HuntStep, DEFAULT_HUNT
+from src.models.migrations import apply_migrations
+from src.services.step_catalog import invalidate_step_catalog
+
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+DEFAULT_STEPS = [
+    {
+        "id": 1,
+        "name": "Black Cat Alley",
+        "clue": "Find the place where cats don't purr — they pop with color on the wall for sure.",
+        "qr_code_url": "URL_TO_QR_CODE_1",
+        "qr_code_value": "BLACKCAT_ALLEY_001"
+    },
+    {
+        "id": 2,
+        "name": "Milwaukee Art Museum",
+        "clue": "What flaps like a bird but never flies? Find the building that spreads its wings by the lake.",
+        "qr_code_url": "URL_TO_QR_CODE_2",
+        "qr_code_value": "ART_MUSEUM_002"
+    },
+    {
+        "id": 3,
+        "name": "Discovery World",
+        "clue": "Where science meets the sea, you'll find a big ship and tech to see.",
+        "qr_code_url": "URL_TO_QR_CODE_3",
+        "qr_code_value": "DISCOVERY_WORLD_003"
+    },
+    {
+        "id": 4,
+        "name": "Lakeshore State Park",
+        "clue": "A park on water — now that's rare! Find the trail with skyline flair.",
+        "qr_code_url": "URL_TO_QR_CODE_4",
+        "qr_code_value": "LAKESHORE_PARK_004"
+    },
+    {
+        "id": 5,
+        "name": "Pierhead Lighthouse",
+        "clue": "It's red and bright and guards the shore, you'll find it near the lakeside floor.",
+        "qr_code_url": "URL_TO_QR_CODE_5",
+        "qr_code_value": "PIERHEAD_LIGHT_005"
+    },
+    {
+        "id": 6,
+        "name": "Historic Third Ward",
+        "clue": "Old warehouses with modern flair, boutiques and murals everywhere!",
+        "qr_code_url": "URL_TO_QR_CODE_6",
+        "qr_code_value": "THIRD_WARD_006"
+    },
+    {
+        "id": 7,
+        "name": "The Hop - Historic Third Ward Stop",
+        "clue": "You don't need a ticket, just wait for the ride. Find the streetcar track and pose with pride!",
+        "qr_code_url": "URL_TO_QR_CODE_7",
+        "qr_code_value": "HOP_STATION_007"
+    },
+    {
+        "id": 8,
+        "name": "Milwaukee Public Market",
+        "clue": "Inside this market, smells float in the air — find cheese, spice, or chocolate fair!",
+        "qr_code_url": "URL_TO_QR_CODE_8",
+        "qr_code_value": "PUBLIC_MARKET_008"
+    },
+    {
+        "id": 9,
+        "name": "Gertie the Duck Statue",
+        "clue": "She once sat beneath a bridge, a wartime hero with a nest to rig.",
+        "qr_code_url": "URL_TO_QR_CODE_9",
+        "qr_code_value": "GERTIE_DUCK_009"
+    },
+    {
+        "id": 10,
+        "name": "The Bronze Fonz",
+        "clue": '"Ayyyy!" is what he\'d say — find this cool guy by the river today.',
+        "qr_code_url": "URL_TO_QR_CODE_10",
+        "qr_code_value": "BRONZE_FONZ_010"
+    },
+    {
+        "id": 11,
+        "name": "Marcus Performing Arts Center",
+        "clue": "Music and drama live here night and day. Find a poster or sculpture on display!",
+        "qr_code_url": "URL_TO_QR_CODE_11",
+        "qr_code_value": "MARCUS_ARTS_011"
+    },
+    {
+        "id": 12,
+        "name": "Milwaukee City Hall",
+        "clue": "With its tall clock tower and historic face, this building stands with elegant grace.",
+        "qr_code_url": "URL_TO_QR_CODE_12",
+        "qr_code_value": "CITY_HALL_012"
+    },
+    {
+        "id": 13,
+        "name": "The Pfister Hotel / Blu Lounge",
+        "clue": "Time to celebrate your final clue — find the place with a stunning view.",
+        "qr_code_url": "URL_TO_QR_CODE_13",
+        "qr_code_value": "PFISTER_HOTEL_013"
+    }
+]
+
+def seed_defaults():
+    # Idempotent: only adds the default admin and steps when they are missing.
+    # Returns what was created.
+    created = []
+    
+    # Create default admin user if not exists
+    if not AdminUser.query.filter_by(username=DEFAULT_ADMIN_USERNAME).first():
+        db.session.add(AdminUser(
+            username=DEFAULT_ADMIN_USERNAME,
+            password_hash=generate_password_hash(DEFAULT_ADMIN_PASSWORD)
+        ))
+        created.append('admin user')
+    
+    # Create the default hunt and its steps, in order, if no hunt exists yet
+    if Hunt.query.count() == 0:
+        hunt = Hunt(**DEFAULT_HUNT)
+        db.session.add(hunt)
+        if ScavengerStep.query.count() == 0:
+            for step_data in DEFAULT_STEPS:
+                db.session.add(ScavengerStep(**step_data))
+        db.session.flush()
+        for position, step_data in enumerate(DEFAULT_STEPS, start=1):
+            db.session.add(HuntStep(hunt_id=hunt.id, position=position, step_id=step_data['id']))
+        created.append(f"hunt '{hunt.slug}' with {len(DEFAULT_STEPS)} steps")
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another process seeded the same rows first
+        db.session.rollback()
+        return []
+    if created:
+        invalidate_step_catalog()
+    return created
+
+def bootstrap_database():
+    # Create missing tables, bring existing ones up to date, then seed.
+    # Safe to run repeatedly.
+    db.create_all()
+    migrations = apply_migrations()
+    return migrations, seed_defaults()
@@ -0,0 +1,59 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def choose_encoding(accept_encodings):
+    # Brotli when the optional package is installed, else gzip
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+def compress(data, encoding, gzip_level=6, brotli_quality=5):
+    if encoding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level)
+
+class JsonCompression:
+    # Compresses JSON responses of at least min_size bytes for clients that
+    # accept it; smaller bodies are not worth the CPU or the header overhead.
+    # Responses with a strong ETag (static .json files) are left alone, as
+    # that validator names the uncompressed bytes.
+    
+    def __init__(self, app=None):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.min_size = app.config.get('JSON_COMPRESS_MIN_BYTES', 1024)
+        self.gzip_level = app.config.get('JSON_COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('JSON_COMPRESS_BROTLI_QUALITY', 5)
+        app.after_request(self.compress_response)
+    
+    def compress_response(self, response):
+        if (self.min_size <= 0 or response.mimetype != 'application/json' or response.status_code != 200
+                or response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers):
+            return response
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        response.set_data(compress(data, encoding, self.gzip_level, self.brotli_quality))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+json_compression = JsonCompression()
@@ -0,0 +1,27 @@
+import hashlib
+from flask import make_response, request
+
+# Conditional GET for polled JSON endpoints. Each endpoint derives a weak ETag
+# from version numbers it can read cheaply (a user's progress_version, the
+# newest matching scan event) and answers 304 before building the body.
+
+def version_etag(*parts):
+    return '.'.join(str(part) for part in parts)
+
+def digest(*parts):
+    # Short stable hash for validators built from query results
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+def is_not_modified(etag):
+    return request.if_none_match.contains_weak(etag)
+
+def not_modified(etag):
+    return with_etag(('', 304), etag)
+
+def with_etag(rv, etag):
+    # private + no-cache: clients revalidate on every poll, shared caches
+    # never store per-user bodies
+    response = make_response(rv)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,214 @@
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+Event = namedtuple('Event', ['id', 'type', 'data'])
+
+class Subscription:
+    # Bounded per-client buffer. A client that falls more than max_buffer
+    # live events behind is dropped rather than slowing down publishers; it
+    # reconnects from last_id, the newest event published so far.
+    
+    def __init__(self, max_buffer):
+        self.max_buffer = max_buffer
+        self.dropped = False
+        self.last_id = None
+        self._limit = max_buffer
+        self._buffer = deque()
+        self._condition = threading.Condition()
+    
+    def replay(self, events):
+        # History for a resuming client. It is bounded by the history size,
+        # so it does not count against max_buffer.
+        with self._condition:
+            self._buffer.extend(events)
+            self._limit = self.max_buffer + len(self._buffer)
+            if events:
+                self.last_id = events[-1].id
+            self._condition.notify()
+    
+    def deliver(self, event):
+        with self._condition:
+            self.last_id = event.id
+            if self.dropped:
+                return
+            if len(self._buffer) >= self._limit:
+                self.dropped = True
+                self._buffer.clear()
+            else:
+                self._buffer.append(event)
+            self._condition.notify()
+    
+    def wait(self, timeout):
+        # Returns the buffered events, or an empty list after timeout
+        with self._condition:
+            if not self._buffer and not self.dropped:
+                self._condition.wait(timeout)
+            events = list(self._buffer)
+            self._buffer.clear()
+            self._limit = self.max_buffer
+            return events
+
+class Broadcaster:
+    # In-process fan-out with a replay history for Last-Event-ID resume
+    
+    def __init__(self, history=1000, client_buffer=256):
+        self.client_buffer = client_buffer
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._last_id = 0
+        self._lock = threading.Lock()
+    
+    def resize(self, history, client_buffer):
+        with self._lock:
+            self._history = deque(self._history, maxlen=history)
+            self.client_buffer = client_buffer
+    
+    def publish(self, event_type, data):
+        with self._lock:
+            event = Event(self._last_id + 1, event_type, data)
+            self._deliver(event)
+        return event
+    
+    def dispatch(self, event):
+        # Events that already carry an id, e.g. relayed from another process
+        with self._lock:
+            self._deliver(event)
+    
+    def _deliver(self, event):
+        # Called with the lock held so every client sees ids in order
+        self._last_id = max(self._last_id, event.id)
+        self._history.append(event)
+        for subscription in self._subscribers:
+            subscription.deliver(event)
+    
+    def subscribe(self, last_event_id=None, subscription=None):
+        # Callers may pass their own subscription, e.g. one that wakes an
+        # asyncio task instead of a thread
+        if subscription is None:
+            subscription = Subscription(self.client_buffer)
+        with self._lock:
+            if last_event_id is not None:
+                subscription.replay([event for event in self._history if event.id > last_event_id])
+            self._subscribers.add(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+# Takes the next event id and publishes the event in one atomic step, so
+# subscribers receive events in id order even with concurrent publishers
+PUBLISH_SCRIPT = """
+local id = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', ARGV[1], '{"id": ' .. id .. ', "type": ' .. ARGV[2] .. ', "data": ' .. ARGV[3] .. '}')
+return id
+"""
+
+class RedisRelay:
+    # Relays events through a Redis-compatible pub/sub channel so every worker
+    # process sees every event. Event ids come from a shared INCR counter.
+    
+    def __init__(self, url, broadcaster, channel='scavenger-hunt:events', max_backoff=30):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.broadcaster = broadcaster
+        self.channel = channel
+        self.max_backoff = max_backoff
+        self._publish = self.client.register_script(PUBLISH_SCRIPT)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def publish(self, event_type, data):
+        self.ensure_listening()
+        self._publish(keys=[f'{self.channel}:last-id'], args=[self.channel, json.dumps(event_type), json.dumps(data)])
+    
+    def ensure_listening(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name='event-bus-relay', daemon=True)
+            self._thread.start()
+    
+    def _listen(self):
+        # Runs for the life of the process: a lost connection is retried with
+        # backoff instead of leaving this worker's streams silent
+        backoff = 1
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                backoff = 1
+                for message in pubsub.listen():
+                    self._dispatch(message)
+            except Exception:
+                logger.exception('Event bus relay disconnected; reconnecting in %ss', backoff)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+    
+    def _dispatch(self, message):
+        try:
+            payload = json.loads(message['data'])
+            self.broadcaster.dispatch(Event(payload['id'], payload['type'], payload['data']))
+        except Exception:
+            logger.exception('Dropping malformed event bus message')
+
+class EventBus:
+    # Publishes hunt activity (scans, reveals, logins, completions) to the
+    # admin event stream. Events stay in-process unless EVENT_BUS_URL points
+    # at a Redis-compatible server.
+    
+    def __init__(self, app=None):
+        self.broadcaster = Broadcaster()
+        self.relay = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.broadcaster.resize(
+            app.config.get('EVENT_STREAM_HISTORY', 1000),
+            app.config.get('EVENT_STREAM_CLIENT_BUFFER', 256)
+        )
+        url = app.config.get('EVENT_BUS_URL')
+        if url:
+            self.relay = RedisRelay(url, self.broadcaster)
+    
+    def publish(self, event_type, **data):
+        # Never let a notification failure break the request that caused it
+        data.setdefault('timestamp', datetime.datetime.utcnow().isoformat())
+        try:
+            if self.relay is not None:
+                self.relay.publish(event_type, data)
+            else:
+                self.broadcaster.publish(event_type, data)
+        except Exception:
+            logger.exception('Failed to publish %s event', event_type)
+    
+    def subscribe(self, last_event_id=None, subscription=None):
+        if self.relay is not None:
+            self.relay.ensure_listening()
+        return self.broadcaster.subscribe(last_event_id, subscription)
+    
+    def unsubscribe(self, subscription):
+        self.broadcaster.unsubscribe(subscription)
+
+event_bus = EventBus()
@@ -0,0 +1,317 @@
+import bisect
+import threading
+import time
+from flask import Response, request
+from sqlalchemy import event
+from src.models.database import db
+
+# Latency buckets (seconds): Prometheus' defaults plus a finer low end for
+# cached hunt reads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name: (type, help, label names, histogram buckets)
+METRICS = {
+    'http_requests_total': (
+        'counter', 'HTTP requests handled, by endpoint and status.',
+        ('blueprint', 'endpoint', 'method', 'status'), None
+    ),
+    'http_request_duration_seconds': (
+        'histogram', 'HTTP request latency.', ('blueprint', 'endpoint', 'method'), LATENCY_BUCKETS
+    ),
+    'http_requests_in_flight': ('gauge', 'HTTP requests being handled.', (), None),
+    'http_request_db_statements': (
+        'histogram', 'SQL statements executed per HTTP request.', ('blueprint', 'endpoint'), STATEMENT_BUCKETS
+    ),
+    'http_request_db_duration_seconds': (
+        'histogram', 'Time spent in SQL statements per HTTP request.', ('blueprint', 'endpoint'), LATENCY_BUCKETS
+    ),
+    'db_statement_duration_seconds': (
+        'histogram', 'SQL statement latency, inside and outside requests.', (), LATENCY_BUCKETS
+    ),
+    'db_pool_checkout_duration_seconds': (
+        'histogram', 'Time to get a pooled connection, including waits for a free one.', (), LATENCY_BUCKETS
+    )
+}
+
+# Read from the pool and the registered caches at scrape time:
+# (name, pool method, help) and (name, stats key, type, help)
+POOL_METRICS = (
+    ('db_pool_size', 'size', 'Persistent connections the pool keeps.'),
+    ('db_pool_checked_out', 'checkedout', 'Connections in use.'),
+    ('db_pool_idle', 'checkedin', 'Connections available in the pool.'),
+    ('db_pool_overflow', 'overflow', 'Connections open beyond the pool size.')
+)
+CACHE_METRICS = (
+    ('cache_hits_total', 'hits', 'counter', 'Cache lookups that found an entry.'),
+    ('cache_misses_total', 'misses', 'counter', 'Cache lookups that missed.'),
+    ('cache_hit_ratio', 'hit_ratio', 'gauge', 'Hits over all lookups since start.'),
+    ('cache_entries', 'entries', 'gauge', 'Entries held.'),
+    ('cache_bytes', 'bytes', 'gauge', 'Bytes held.'),
+    ('cache_evictions_total', 'evictions', 'counter', 'Entries evicted to stay within bounds.')
+)
+
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+IN_FLIGHT = ('http_requests_in_flight', ())
+STATEMENT_DURATION = ('db_statement_duration_seconds', ())
+POOL_CHECKOUT = ('db_pool_checkout_duration_seconds', ())
+
+class _Shard:
+    # Metrics written by a single thread. Only the owning thread updates it,
+    # so recording needs no lock; scrapes copy the dicts, which the GIL keeps
+    # consistent.
+    __slots__ = ('thread', 'counters', 'histograms', 'request')
+    
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}
+        self.histograms = {}
+        # [started, statements, statement seconds, status] of the current request
+        self.request = None
+    
+    def merge(self, counters, histograms):
+        for key, value in counters:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, counts in histograms:
+            totals = self.histograms.get(key)
+            if totals is None:
+                self.histograms[key] = list(counts)
+            else:
+                for i, count in enumerate(counts):
+                    totals[i] += count
+
+def _observe(histograms, key, buckets, value):
+    counts = histograms.get(key)
+    if counts is None:
+        # One count per bucket, +Inf, then the sum
+        counts = histograms[key] = [0] * (len(buckets) + 2)
+    counts[bisect.bisect_left(buckets, value)] += 1
+    counts[-1] += value
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+class Metrics:
+    # Prometheus text exposition of request, SQL, pool and cache metrics for
+    # this process. Each thread records into its own shard; a scrape sums the
+    # shards, folding in those of threads that have exited.
+    
+    def __init__(self):
+        self.enabled = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _Shard()
+        self._engines = []
+        self._caches = {}
+        self._keys = {}
+    
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.expose)
+        with app.app_context():
+            self.instrument_engine(db.engine)
+    
+    def register_cache(self, name, stats):
+        # stats() returns a dict with hits and misses, and optionally entries,
+        # bytes and evictions
+        self._caches[name] = stats
+    
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._retire_exited()
+                self._shards.append(shard)
+            return shard
+    
+    def _retire_exited(self):
+        # Threads that exited can no longer write to their shards. Called with
+        # _lock held; keeps the list bounded under thread-per-request servers.
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                self._retired.merge(shard.counters.items(), shard.histograms.items())
+        self._shards = live
+    
+    def _request_keys(self, endpoint, method, status):
+        # Metric keys per endpoint, method and status, built once. Methods
+        # Flask does not route are folded so clients cannot add label values.
+        if method not in HTTP_METHODS:
+            method = 'OTHER'
+        keys = self._keys.get((endpoint, method, status))
+        if keys is None:
+            blueprint, _, name = endpoint.rpartition('.') if endpoint else ('', '', 'unmatched')
+            keys = self._keys[(endpoint, method, status)] = (
+                ('http_requests_total', (blueprint, name, method, str(status))),
+                ('http_request_duration_seconds', (blueprint, name, method)),
+                ('http_request_db_statements', (blueprint, name)),
+                ('http_request_db_duration_seconds', (blueprint, name))
+            )
+        return keys
+    
+    def request_started(self):
+        # For requests handled outside Flask (the native ASGI routes); several
+        # may be in flight on the event loop thread at once
+        shard = self._shard()
+        shard.counters[IN_FLIGHT] = shard.counters.get(IN_FLIGHT, 0) + 1
+        return shard
+    
+    def request_finished(self, shard, endpoint, method, status, elapsed):
+        requests_key, duration_key, _, _ = self._request_keys(endpoint, method, status)
+        counters = shard.counters
+        counters[IN_FLIGHT] -= 1
+        counters[requests_key] = counters.get(requests_key, 0) + 1
+        _observe(shard.histograms, duration_key, LATENCY_BUCKETS, elapsed)
+    
+    def _before_request(self):
+        # Flask requests in flight are the shards with a current request
+        self._shard().request = [time.perf_counter(), 0, 0.0, 500]
+    
+    def _after_request(self, response):
+        state = self._shard().request
+        if state is not None:
+            state[3] = response.status_code
+        return response
+    
+    def _teardown_request(self, exc):
+        shard = self._shard()
+        state = shard.request
+        if state is None:
+            return
+        shard.request = None
+        elapsed = time.perf_counter() - state[0]
+        current = request._get_current_object()
+        requests_key, duration_key, statements_key, statement_seconds_key = self._request_keys(
+            current.endpoint, current.method, state[3]
+        )
+        counters = shard.counters
+        counters[requests_key] = counters.get(requests_key, 0) + 1
+        histograms = shard.histograms
+        _observe(histograms, duration_key, LATENCY_BUCKETS, elapsed)
+        _observe(histograms, statements_key, STATEMENT_BUCKETS, state[1])
+        _observe(histograms, statement_seconds_key, LATENCY_BUCKETS, state[2])
+    
+    def instrument_engine(self, engine):
+        # Statement counts and timings, attributed to the request running on
+        # the same thread, plus pool checkout times. engine.dispose() replaces
+        # the pool (e.g. after a fork), so the new one is wrapped again.
+        self._engines.append(engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'engine_disposed', self._instrument_pool)
+        self._instrument_pool(engine)
+    
+    def _instrument_pool(self, engine):
+        pool = engine.pool
+        connect = pool.connect
+        
+        def timed_connect():
+            started = time.perf_counter()
+            try:
+                return connect()
+            finally:
+                _observe(self._shard().histograms, POOL_CHECKOUT, LATENCY_BUCKETS, time.perf_counter() - started)
+        
+        pool.connect = timed_connect
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context.metrics_started = time.perf_counter()
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.metrics_started
+        shard = self._shard()
+        _observe(shard.histograms, STATEMENT_DURATION, LATENCY_BUCKETS, elapsed)
+        state = shard.request
+        if state is not None:
+            state[1] += 1
+            state[2] += elapsed
+    
+    def _collect(self):
+        collected = _Shard()
+        with self._lock:
+            self._retire_exited()
+            shards = [self._retired] + self._shards
+            for shard in shards:
+                collected.merge(list(shard.counters.items()),
+                                [(key, list(counts)) for key, counts in list(shard.histograms.items())])
+            in_flight = sum(1 for shard in self._shards if shard.request is not None)
+        collected.counters[IN_FLIGHT] = collected.counters.get(IN_FLIGHT, 0) + in_flight
+        families = {}
+        for (name, labels), value in collected.counters.items():
+            families.setdefault(name, {})[labels] = value
+        for (name, labels), counts in collected.histograms.items():
+            families.setdefault(name, {})[labels] = counts
+        return families
+    
+    def render(self):
+        families = self._collect()
+        lines = []
+        for name, (kind, help_text, label_names, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            samples = families.get(name) or ({(): 0} if not label_names and kind != 'histogram' else {})
+            for labels, value in sorted(samples.items()):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(label_names, labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(label_names + ("le",), labels + (bound,))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(label_names, labels)} {value[-1]}')
+                lines.append(f'{name}_count{_labels(label_names, labels)} {cumulative}')
+        lines.extend(self._pool_lines())
+        lines.extend(self._cache_lines())
+        return '\n'.join(lines) + '\n'
+    
+    def _pool_lines(self):
+        # QueuePool gauges; other pool classes (e.g. in-memory SQLite) have none
+        pools = [
+            (_labels(('engine',), (engine.url.render_as_string(hide_password=True),)), engine.pool)
+            for engine in self._engines if hasattr(engine.pool, 'checkedout')
+        ]
+        lines = []
+        for name, method, help_text in POOL_METRICS:
+            if pools:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} gauge')
+                # overflow() counts up from -pool_size
+                lines.extend(f'{name}{labels} {max(0, getattr(pool, method)())}' for labels, pool in pools)
+        return lines
+    
+    def _cache_lines(self):
+        caches = []
+        for name, stats in sorted(self._caches.items()):
+            stats = dict(stats())
+            lookups = stats.get('hits', 0) + stats.get('misses', 0)
+            stats['hit_ratio'] = round(stats.get('hits', 0) / lookups, 6) if lookups else 0
+            caches.append((_labels(('cache',), (name,)), stats))
+        lines = []
+        for name, key, kind, help_text in CACHE_METRICS:
+            values = [f'{name}{labels} {stats[key]}' for labels, stats in caches if key in stats]
+            if values:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(values)
+        return lines
+    
+    def expose(self):
+        return Response(self.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+metrics = Metrics()
@@ -0,0 +1,36 @@
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+class PaginationError(ValueError):
+    pass
+
+def encode_cursor(timestamp, row_id):
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.datetime.fromisoformat(timestamp), row_id
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    if value is None:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def parse_timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError('Invalid timestamp')
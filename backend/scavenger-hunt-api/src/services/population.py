@@ -0,0 +1,167 @@
+import datetime
+import random
+import time
+from collections import namedtuple
+from sqlalchemy import insert
+from src.models.database import db
+from src.models.user import User
+from src.models.user_step_progress import UserStepProgress
+from src.models.scan_event import ScanEvent
+
+# Synthetic players for performance testing. Each player moves on after a
+# step with CONTINUE_RATE, so most drop out early and a few finish, and
+# reveals about REVEAL_RATE of the locations they reach. Progress rows,
+# progress_version, current_step and the successful scan events always agree
+# with each other; wrong scans make up the rest of the requested events.
+CONTINUE_RATE = 0.85
+REVEAL_RATE = 0.3
+# Mean time between solving two steps
+STEP_SECONDS = 900
+
+USER_COLUMNS = ('id', 'email', 'phone', 'hunt_id', 'current_step', 'progress_version', 'created_at', 'last_active')
+PROGRESS_COLUMNS = ('user_id', 'step_id', 'completed_at', 'revealed_at')
+SCAN_COLUMNS = ('id', 'user_id', 'step_id', 'scanned_at', 'success', 'revealed_first')
+
+PopulationReport = namedtuple('PopulationReport', ['users', 'progress_rows', 'scan_events', 'successful_scans', 'seconds'])
+
+class BulkInsert:
+    # executemany of plain tuples straight through the DBAPI cursor. Bind
+    # processors of the column types are mapped over whole columns, which
+    # skips the per-row parameter handling of Connection.execute(insert(), dicts).
+    
+    def __init__(self, connection, table, columns):
+        dialect = connection.dialect
+        compiled = insert(table).compile(dialect=dialect, column_keys=list(columns))
+        self.connection = connection
+        self.sql = str(compiled)
+        self.columns = columns
+        # Positional paramstyles take the values in the compiled order
+        self.positional = compiled.positional
+        self.order = [columns.index(key) for key in compiled.positiontup] if compiled.positional else None
+        self.processors = [
+            table.c[column].type.dialect_impl(dialect).bind_processor(dialect) for column in columns
+        ]
+    
+    def _params(self, rows):
+        values = [
+            list(map(processor, column)) if processor else column
+            for column, processor in zip(zip(*rows), self.processors)
+        ]
+        if not self.positional:
+            return [dict(zip(self.columns, row)) for row in zip(*values)]
+        return list(zip(*(values[i] for i in self.order)))
+    
+    def __call__(self, rows, chunk_size=10000):
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if chunk:
+                self.connection.exec_driver_sql(self.sql, self._params(chunk))
+
+def _uuid(rng):
+    # uuid4-shaped, from the seeded generator so populations are reproducible
+    h = '%032x' % rng.getrandbits(128)
+    return f'{h[:8]}-{h[8:12]}-4{h[13:16]}-a{h[17:20]}-{h[20:]}'
+
+def _player(rng, hunt, index, prefix, window_start, window, now):
+    # (user row, progress rows, successful scan rows, steps reached as
+    # (step_id, revealed_at))
+    user_id = _uuid(rng)
+    created_at = window_start + datetime.timedelta(seconds=rng.random() * window)
+    total = hunt.total_steps
+    completed = 0
+    while completed < total and rng.random() < CONTINUE_RATE:
+        completed += 1
+    
+    progress, scans, reached = [], [], []
+    version = 0
+    at = last_active = created_at
+    for step in hunt.steps[:completed + 1]:
+        solved = len(reached) < completed
+        revealed_at = None
+        if rng.random() < REVEAL_RATE:
+            revealed_at = min(at + datetime.timedelta(seconds=rng.random() * STEP_SECONDS), now)
+            last_active = max(last_active, revealed_at)
+            version += 1
+        completed_at = None
+        if solved:
+            at = min(at + datetime.timedelta(seconds=rng.expovariate(1 / STEP_SECONDS)), now)
+            if revealed_at and revealed_at > at:
+                at = revealed_at
+            completed_at = last_active = at
+            version += 1
+            scans.append((_uuid(rng), user_id, step.id, completed_at, True, revealed_at is not None))
+        if completed_at or revealed_at:
+            progress.append((user_id, step.id, completed_at, revealed_at))
+        reached.append((step.id, revealed_at))
+    
+    user = (user_id, f'{prefix}{index}@example.com', None, hunt.id, min(completed + 1, total), version,
+            created_at, last_active)
+    return user, progress, scans, reached
+
+def _wrong_scans(rng, players, count):
+    # Spread wrong scans over the batch: a random player, one of the steps they
+    # reached, some time while they were active. players: (user id, created_at,
+    # time active, steps reached)
+    scans = []
+    random_value = rng.random
+    players_count = len(players)
+    for _ in range(count):
+        user_id, created_at, active, reached = players[int(random_value() * players_count)]
+        step_id, revealed_at = reached[int(random_value() * len(reached))]
+        scanned_at = created_at + active * random_value()
+        scans.append((_uuid(rng), user_id, step_id, scanned_at, False,
+                      revealed_at is not None and revealed_at <= scanned_at))
+    return scans
+
+def _deferrable_indexes():
+    return [index for table in (ScanEvent.__table__, UserStepProgress.__table__) for index in table.indexes]
+
+def populate(hunt, users, events, batch_size=10000, seed=None, prefix='player', days=2.0,
+             defer_indexes=True, on_batch=None):
+    # Bulk-loads `users` players into the catalog hunt `hunt` with about
+    # `events` scan events in total, batch_size players per transaction.
+    # Every player's successful scans are kept even when that exceeds
+    # `events`. With defer_indexes the secondary indexes of scan_events and
+    # user_step_progress are dropped for the load and rebuilt at the end,
+    # which is much faster than maintaining them row by row.
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    window = days * 86400
+    window_start = now - datetime.timedelta(seconds=window)
+    started = time.perf_counter()
+    totals = {'users': 0, 'progress_rows': 0, 'scan_events': 0, 'successful_scans': 0}
+    
+    deferred = _deferrable_indexes() if defer_indexes else []
+    for index in deferred:
+        index.drop(db.engine, checkfirst=True)
+    try:
+        for offset in range(0, users, batch_size):
+            count = min(batch_size, users - offset)
+            user_rows, players, progress_rows, scan_rows = [], [], [], []
+            for index in range(offset, offset + count):
+                user, progress, scans, reached = _player(rng, hunt, index, prefix, window_start, window, now)
+                user_rows.append(user)
+                players.append((user[0], user[6], user[7] - user[6], reached))
+                progress_rows.extend(progress)
+                scan_rows.extend(scans)
+            successes = len(scan_rows)
+            # Events owed up to the end of this batch, so the total lands on `events`
+            owed = events * (offset + count) // users - totals['scan_events']
+            scan_rows.extend(_wrong_scans(rng, players, max(0, owed - successes)))
+            
+            with db.engine.begin() as connection:
+                BulkInsert(connection, User.__table__, USER_COLUMNS)(user_rows)
+                BulkInsert(connection, UserStepProgress.__table__, PROGRESS_COLUMNS)(progress_rows)
+                BulkInsert(connection, ScanEvent.__table__, SCAN_COLUMNS)(scan_rows)
+            
+            totals['users'] += count
+            totals['progress_rows'] += len(progress_rows)
+            totals['scan_events'] += len(scan_rows)
+            totals['successful_scans'] += successes
+            if on_batch:
+                on_batch(PopulationReport(seconds=time.perf_counter() - started, **totals))
+    finally:
+        for index in deferred:
+            index.create(db.engine, checkfirst=True)
+    
+    return PopulationReport(seconds=time.perf_counter() - started, **totals)
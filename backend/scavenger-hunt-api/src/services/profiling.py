@@ -0,0 +1,219 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, namedtuple
+
+# Bounds for an on-demand CPU profile; the profiling request blocks for its
+# whole duration
+DEFAULT_PROFILE_SECONDS = 10
+MAX_PROFILE_SECONDS = 120
+DEFAULT_INTERVAL_MS = 10
+MIN_INTERVAL_MS = 1
+
+ProfileResult = namedtuple('ProfileResult', ['stacks', 'samples', 'seconds', 'requests', 'interval'])
+
+class ProfilerBusy(Exception):
+    pass
+
+class _Session:
+
+    def __init__(self, interval, max_requests, all_threads, caller):
+        self.interval = interval
+        self.max_requests = max_requests
+        self.all_threads = all_threads
+        self.caller = caller
+        self.stacks = Counter()
+        self.samples = 0
+        self.requests = 0
+        self.done = threading.Event()
+
+class SamplingProfiler:
+    # Statistical CPU profiler for this worker process. A background thread
+    # reads every thread's current stack each interval and counts identical
+    # stacks; nothing is traced between samples, so requests run at full
+    # speed. By default only threads serving a Flask request are sampled.
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._busy_threads = set()
+        self._labels = {}
+    
+    def init_app(self, app):
+        app.before_request(self._request_started)
+        app.teardown_request(self._request_finished)
+    
+    def _request_started(self):
+        self._busy_threads.add(threading.get_ident())
+    
+    def _request_finished(self, exc):
+        ident = threading.get_ident()
+        self._busy_threads.discard(ident)
+        session = self._session
+        if session is not None and ident != session.caller:
+            with self._lock:
+                session.requests += 1
+            if session.max_requests and session.requests >= session.max_requests:
+                session.done.set()
+    
+    def profile(self, seconds=DEFAULT_PROFILE_SECONDS, max_requests=None, interval_ms=DEFAULT_INTERVAL_MS,
+                all_threads=False):
+        # Blocks until `seconds` have passed or `max_requests` other requests
+        # have finished, whichever comes first. One profile at a time.
+        session = _Session(interval_ms / 1000, max_requests, all_threads, threading.get_ident())
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusy('A profile is already running in this worker')
+            self._session = session
+        started = time.perf_counter()
+        sampler = threading.Thread(target=self._sample, args=(session,), name='sampling-profiler', daemon=True)
+        try:
+            sampler.start()
+            session.done.wait(seconds)
+        finally:
+            session.done.set()
+            sampler.join()
+            self._session = None
+        return ProfileResult(session.stacks, session.samples, time.perf_counter() - started,
+                             session.requests, session.interval)
+    
+    def _sample(self, session):
+        me = threading.get_ident()
+        skip = (me, session.caller)
+        next_sample = time.perf_counter()
+        while not session.done.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident in skip or (not session.all_threads and ident not in self._busy_threads):
+                    continue
+                session.stacks[self._stack(frame)] += 1
+            session.samples += 1
+            # Fixed schedule, so slow samples do not stretch the interval
+            next_sample += session.interval
+            session.done.wait(max(0, next_sample - time.perf_counter()))
+    
+    def _stack(self, frame):
+        # Root first; one label per function so lines of the same function merge
+        stack = []
+        labels = self._labels
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = (code.co_name, _short_path(code.co_filename), code.co_firstlineno)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+def _short_path(filename):
+    # Relative to the longest sys.path entry containing it (site-packages,
+    # the project root), which keeps frame names readable
+    best = ''
+    for entry in sys.path:
+        if entry and filename.startswith(entry.rstrip(os.sep) + os.sep) and len(entry) > len(best):
+            best = entry
+    return os.path.relpath(filename, best) if best else filename
+
+def collapsed(result):
+    # Brendan Gregg's folded format: "root;caller;callee count" per stack, for
+    # flamegraph.pl, speedscope and most flame graph viewers
+    lines = []
+    for stack, count in result.stacks.most_common():
+        lines.append(';'.join(f'{name} ({path}:{line})' for name, path, line in stack) + f' {count}')
+    return '\n'.join(lines) + '\n'
+
+def speedscope(result, name='scavenger-hunt-api'):
+    # https://www.speedscope.app/file-format-schema.json, one sampled profile
+    # with each distinct stack weighted by its time
+    frames = []
+    index = {}
+    samples = []
+    weights = []
+    for stack, count in result.stacks.most_common():
+        sample = []
+        for frame in stack:
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append({'name': frame[0], 'file': frame[1], 'line': frame[2]})
+            sample.append(index[frame])
+        samples.append(sample)
+        weights.append(round(count * result.interval, 6))
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'scavenger-hunt-api',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled',
+            'name': f'{name} ({result.samples} samples, {result.requests} requests)',
+            'unit': 'seconds',
+            'startValue': 0,
+            'endValue': round(sum(weights), 6),
+            'samples': samples,
+            'weights': weights
+        }]
+    }
+
+class MemoryTracer:
+    # tracemalloc for finding memory growth in a live worker: start tracing,
+    # then each snapshot reports the largest allocation sites and what grew
+    # since the previous snapshot. Tracing slows allocations noticeably, so
+    # stop it when done.
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._previous = None
+    
+    def start(self, frames=1):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._previous = self._take()
+    
+    def stop(self):
+        with self._lock:
+            self._previous = None
+            tracemalloc.stop()
+    
+    @staticmethod
+    def _take():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>')
+        ))
+    
+    def snapshot(self, limit=20, group_by='lineno'):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = self._take()
+            previous, self._previous = self._previous, snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        # Tracing may have been started outside start() (PYTHONTRACEMALLOC)
+        growth = []
+        if previous is not None:
+            growth = [stat for stat in snapshot.compare_to(previous, group_by) if stat.size_diff > 0][:limit]
+        return {
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'top': [{
+                'where': _where(stat.traceback),
+                'size_bytes': stat.size,
+                'count': stat.count
+            } for stat in snapshot.statistics(group_by)[:limit]],
+            'growth': [{
+                'where': _where(stat.traceback),
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count_diff': stat.count_diff
+            } for stat in growth]
+        }
+
+def _where(traceback):
+    return [f'{_short_path(frame.filename)}:{frame.lineno}' for frame in traceback]
+
+sampling_profiler = SamplingProfiler()
+memory_tracer = MemoryTracer()
@@ -0,0 +1,70 @@
+import threading
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping cost on top of the body, for the memory bound
+ENTRY_OVERHEAD = 256
+
+class ProgressCache:
+    # Serialized current-step/progress documents per user, as the exact bytes
+    # sent to the client. An entry is only valid for the progress_version and
+    # hunt fingerprint it was built from, so writes never need to evict:
+    # the next poll after a scan, reveal, reset or skip simply misses. Bounded
+    # by total bytes with LRU eviction; 0 disables it.
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, view, user_id, version):
+        # version: (progress_version, hunt fingerprint)
+        key = (view, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, view, user_id, version, body):
+        cost = len(body) + ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        key = (view, user_id)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1]) + ENTRY_OVERHEAD
+            self._entries[key] = (version, body)
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted) + ENTRY_OVERHEAD
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+progress_cache = ProgressCache()
+
+def configure_progress_cache(config):
+    progress_cache.max_bytes = config.get('PROGRESS_CACHE_MAX_BYTES', 32 * 1024 * 1024)
@@ -0,0 +1,221 @@
+import atexit
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from sqlalchemy import event
+from src.models.database import db
+from src.models.scan_event import ScanEvent
+
+logger = logging.getLogger(__name__)
+
+# Session.info key for async-mode rows waiting for their request to commit
+PENDING_KEY = 'pending_scan_events'
+
+class ScanEventWriter:
+    # Records scan events either synchronously in the request transaction
+    # ('sync', the default) or through a bounded in-process queue that a
+    # background thread flushes with batched executemany inserts ('async').
+    #
+    # Durability in async mode:
+    #   'strict'      - when the queue is full, fall back to a synchronous
+    #                   insert so no event is lost while the process is alive
+    #   'best_effort' - when the queue is full, drop the event and count it
+    # Queued events are flushed on interpreter shutdown; a hard kill loses
+    # whatever is still in the queue. Either way an event is only queued once
+    # the request transaction commits, so a failed request leaves none behind.
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'sync'
+        self.durability = 'strict'
+        self.max_queue = 10000
+        self.batch_size = 500
+        self.flush_interval = 0.2
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._stopping = False
+        self._counters = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'sync_fallbacks': 0,
+            'failed': 0,
+            'batches': 0
+        }
+        self._last_flush_ms = 0.0
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config.get('SCAN_EVENT_WRITE_MODE', 'sync')
+        self.durability = app.config.get('SCAN_EVENT_DURABILITY', 'strict')
+        self.max_queue = app.config.get('SCAN_EVENT_QUEUE_SIZE', 10000)
+        self.batch_size = app.config.get('SCAN_EVENT_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('SCAN_EVENT_FLUSH_MS', 200) / 1000.0
+        if self.mode == 'async':
+            atexit.register(self.stop)
+        if not event.contains(db.session, 'after_commit', self._after_commit):
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_soft_rollback', self._after_soft_rollback)
+    
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self._counters[name] += amount
+    
+    def record(self, user_id, step_id, success, revealed_first=False):
+        if self.mode != 'async':
+            db.session.add(ScanEvent(user_id=user_id, step_id=step_id, success=success, revealed_first=revealed_first))
+            return
+        
+        row = {
+            'id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'step_id': step_id,
+            'scanned_at': datetime.datetime.utcnow(),
+            'success': success,
+            'revealed_first': revealed_first
+        }
+        db.session.info.setdefault(PENDING_KEY, []).append(row)
+    
+    def _after_commit(self, session):
+        for row in session.info.pop(PENDING_KEY, []):
+            self._enqueue(row)
+    
+    def _after_soft_rollback(self, session, previous_transaction):
+        # A rolled back savepoint keeps the request's events
+        if not previous_transaction.nested:
+            session.info.pop(PENDING_KEY, None)
+    
+    def _enqueue(self, row):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            self._count('enqueued')
+        except queue.Full:
+            if self.durability != 'strict':
+                self._count('dropped')
+                return
+            # The request already committed, so insert in a transaction of its own
+            self._count('sync_fallbacks')
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(ScanEvent.__table__.insert(), [row])
+            except Exception:
+                self._count('failed')
+                logger.exception('Failed to write a scan event')
+    
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker whose parent had a writer
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='scan-event-writer', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping:
+                    return
+                continue
+            if item is None:
+                self._queue.task_done()
+                return
+            batch.append(item)
+            
+            # Collect up to batch_size rows or until the flush interval elapses
+            deadline = time.monotonic() + self.flush_interval
+            stop_after = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stop_after = True
+                    break
+                batch.append(item)
+            
+            self._write(batch)
+            if stop_after:
+                return
+    
+    def _write(self, batch):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(ScanEvent.__table__.insert(), batch)
+            self._count('written', len(batch))
+            self._count('batches')
+        except Exception:
+            self._count('failed', len(batch))
+            logger.exception('Failed to write %d scan events', len(batch))
+        finally:
+            self._last_flush_ms = (time.perf_counter() - started) * 1000
+            for _ in batch:
+                self._queue.task_done()
+    
+    def flush(self):
+        # Block until everything queued so far has been written
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+    
+    def stop(self, timeout=10):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        # Anything left behind (e.g. the thread timed out) is written inline
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftover.append(item)
+            else:
+                self._queue.task_done()
+        if leftover:
+            self._write(leftover)
+        self._thread = None
+    
+    def metrics(self):
+        depth = self._queue.qsize() if self._queue is not None else 0
+        with self._counter_lock:
+            counters = dict(self._counters)
+        return dict(
+            counters,
+            mode=self.mode,
+            durability=self.durability,
+            queue_depth=depth,
+            queue_capacity=self.max_queue,
+            last_flush_ms=round(self._last_flush_ms, 2)
+        )
+
+scan_event_writer = ScanEventWriter()
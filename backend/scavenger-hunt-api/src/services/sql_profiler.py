@@ -0,0 +1,162 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from src.models.database import db
+
+logger = logging.getLogger(__name__)
+
+# Parts of a statement that differ between executions of the same query:
+# inlined literals, and expanded IN lists whose length follows the data
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PARAMETER = r'(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)'
+_PARAMETER_LISTS = re.compile(rf'\(\s*{_PARAMETER}(?:\s*,\s*{_PARAMETER})*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(statement):
+    statement = _LITERALS.sub('?', statement)
+    statement = _PARAMETER_LISTS.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+class StatementLog:
+    # Statements run on one thread while the log is active
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = []
+    
+    def add(self, statement, seconds):
+        self.statements.append((statement, seconds))
+    
+    @property
+    def count(self):
+        return len(self.statements)
+    
+    @property
+    def seconds(self):
+        return sum(seconds for _, seconds in self.statements)
+    
+    def repeats(self, threshold):
+        # (fingerprint, executions) of statement shapes run at least threshold
+        # times: a query issued once per row of an earlier result (N+1)
+        counts = Counter(fingerprint(statement) for statement, _ in self.statements)
+        return [(shape, count) for shape, count in counts.most_common() if count >= threshold]
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+class SqlProfiler:
+    # Opt-in per-request SQL profiling (SQL_PROFILING=true): counts and times
+    # the statements of each request, adds a Server-Timing header, logs a
+    # summary line and warns about repeated statement shapes. Engine
+    # listeners are only attached once profiling or a query_budget() is used.
+    
+    def __init__(self):
+        self.enabled = False
+        self.repeat_threshold = 5
+        self._local = threading.local()
+        self._engines = []
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        self.enabled = app.config.get('SQL_PROFILING', False)
+        self.repeat_threshold = app.config.get('SQL_PROFILE_REPEAT_THRESHOLD', 5)
+        if not self.enabled:
+            return
+        logger.setLevel(logging.INFO)
+        if not logging.getLogger().handlers:
+            # Nothing set up logging (development server, gunicorn workers):
+            # print the summaries to stderr rather than drop them
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+            logger.addHandler(handler)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._end_request)
+        with app.app_context():
+            self.instrument_engine(db.engine)
+    
+    def instrument_engine(self, engine):
+        with self._lock:
+            if engine in self._engines:
+                return
+            self._engines.append(engine)
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+    
+    def start(self):
+        log = StatementLog()
+        logs = getattr(self._local, 'logs', None)
+        if logs is None:
+            logs = self._local.logs = []
+        logs.append(log)
+        return log
+    
+    def stop(self, log):
+        logs = getattr(self._local, 'logs', [])
+        if log in logs:
+            logs.remove(log)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if getattr(self._local, 'logs', None):
+            context.profile_started = time.perf_counter()
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        logs = getattr(self._local, 'logs', None)
+        started = getattr(context, 'profile_started', None)
+        if not logs or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        for log in logs:
+            log.add(statement, elapsed)
+    
+    def _start_request(self):
+        g.sql_profile = self.start()
+    
+    def _finish_request(self, response):
+        log = g.get('sql_profile')
+        if log is None:
+            return response
+        total_ms = (time.perf_counter() - log.started) * 1000
+        db_ms = log.seconds * 1000
+        response.headers.add(
+            'Server-Timing', f'db;desc="{log.count} statements";dur={db_ms:.2f}, app;dur={total_ms:.2f}'
+        )
+        logger.info('%s %s %s: %d SQL statements in %.2fms of %.2fms', request.method, request.path,
+                    response.status_code, log.count, db_ms, total_ms)
+        for shape, count in log.repeats(self.repeat_threshold):
+            logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape)
+        return response
+    
+    def _end_request(self, exc):
+        log = g.pop('sql_profile', None)
+        if log is not None:
+            self.stop(log)
+
+sql_profiler = SqlProfiler()
+
+@contextmanager
+def query_budget(max_statements, max_repeats=None):
+    # For tests and CI checks, inside an app context: raises
+    # QueryBudgetExceeded when the block (e.g. a test client request) runs
+    # more than max_statements statements, or any one statement shape more
+    # than max_repeats times
+    sql_profiler.instrument_engine(db.engine)
+    log = sql_profiler.start()
+    try:
+        yield log
+    finally:
+        sql_profiler.stop(log)
+    
+    problems = []
+    if log.count > max_statements:
+        problems.append(f'{log.count} SQL statements, budget is {max_statements}')
+    if max_repeats is not None:
+        for shape, count in log.repeats(max_repeats + 1):
+            problems.append(f'{count} x {shape}')
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
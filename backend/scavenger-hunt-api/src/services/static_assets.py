@@ -0,0 +1,154 @@
+import hashlib
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from flask import Response, request, send_file
+
+# Vite emits content-hashed bundles such as assets/index-B1x2c3d4.js; their
+# URL changes whenever their content does, so clients may cache them forever
+HASHED_ASSET = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8}\.[a-z0-9]+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+# Precompressed variants written next to the originals, best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'application/manifest+json',
+                'application/xml', 'image/svg+xml')
+
+Variant = namedtuple('Variant', ['path', 'size', 'etag', 'body'])
+
+class StaticAsset(namedtuple('StaticAsset', ['name', 'mimetype', 'cache_control', 'variants'])):
+    __slots__ = ()
+    
+    def select(self, accept_encodings):
+        # (encoding, variant) for the best representation the client accepts
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accept_encodings[encoding] > 0:
+                return encoding, self.variants[encoding]
+        return None, self.variants[None]
+
+class StaticAssetIndex:
+    # Snapshot of the static folder taken at startup: one stat/hash per file
+    # instead of filesystem lookups per request. Files up to inline_max bytes
+    # are kept in memory while the total stays under memory_limit.
+    
+    def __init__(self, root, inline_max=64 * 1024, memory_limit=16 * 1024 * 1024):
+        self.root = root
+        self.inline_max = inline_max
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.assets = {}
+        if root and os.path.isdir(root):
+            self._scan()
+    
+    def _scan(self):
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.assets[name] = self._load(name, path)
+    
+    def _variant(self, path, tag):
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        body = None
+        if size <= self.inline_max and self.memory_used + size <= self.memory_limit:
+            body = data
+            self.memory_used += size
+        # Strong validator per representation, from the bytes actually sent
+        digest = hashlib.blake2b(data, digest_size=12).hexdigest()
+        return Variant(path, size, f'"{digest}{tag}"', body)
+    
+    def _load(self, name, path):
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        variants = {None: self._variant(path, '')}
+        if mimetype.startswith(COMPRESSIBLE):
+            for encoding, suffix in ENCODINGS:
+                if os.path.isfile(path + suffix):
+                    variants[encoding] = self._variant(path + suffix, '-' + suffix[1:])
+        cache_control = IMMUTABLE if HASHED_ASSET.search(name) else REVALIDATE
+        return StaticAsset(name, mimetype, cache_control, variants)
+    
+    def get(self, name):
+        return self.assets.get(name)
+
+class StaticAssets:
+    # Serves the bundled PWA: precompressed variants, immutable caching for
+    # hashed bundles and ETag revalidation for everything else. Unknown paths
+    # get index.html so client-side routes work.
+    
+    def __init__(self, app=None):
+        self.index = StaticAssetIndex(None)
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.index = StaticAssetIndex(
+            app.static_folder,
+            app.config.get('STATIC_INLINE_MAX_BYTES', 64 * 1024),
+            app.config.get('STATIC_MEMORY_LIMIT_BYTES', 16 * 1024 * 1024)
+        )
+    
+    def serve(self, path):
+        asset = self.index.get(path) if path else None
+        if asset is None:
+            asset = self.index.get('index.html')
+            if asset is None:
+                return "index.html not found", 404
+        
+        encoding, variant = asset.select(request.accept_encodings)
+        if request.if_none_match.contains_weak(variant.etag.strip('"')):
+            response = Response(status=304)
+        elif variant.body is not None:
+            response = Response(variant.body, mimetype=asset.mimetype)
+        else:
+            response = send_file(variant.path, mimetype=asset.mimetype, conditional=False,
+                                 etag=False, last_modified=None, max_age=None)
+        
+        response.headers['ETag'] = variant.etag
+        response.headers['Cache-Control'] = asset.cache_control
+        if encoding and response.status_code == 200:
+            response.headers['Content-Encoding'] = encoding
+        if len(asset.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        return response
+
+static_assets = StaticAssets()
+
+def precompress_static(root, min_size=1024, brotli_quality=11):
+    # Writes .gz (and .br when the brotli package is installed) next to every
+    # compressible file of at least min_size bytes; run after each frontend
+    # build. Returns the paths written.
+    import gzip
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    
+    written = []
+    suffixes = tuple(suffix for _, suffix in ENCODINGS)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            mimetype = mimetypes.guess_type(filename)[0] or ''
+            if filename.endswith(suffixes) or not mimetype.startswith(COMPRESSIBLE):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            outputs = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                outputs.append(('.br', brotli.compress(data, quality=brotli_quality)))
+            for suffix, compressed in outputs:
+                # Only keep variants that are actually smaller
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written.append(path + suffix)
+    return written
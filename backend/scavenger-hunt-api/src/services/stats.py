@@ -0,0 +1,71 @@
+from sqlalchemy import func
+from src.models.database import db
+from src.models.user import User
+from src.models.user_step_progress import UserStepProgress
+from src.models.scan_event import ScanEvent
+from src.services.step_catalog import get_step_catalog
+
+def _rate(count, total):
+    return round((count / total * 100), 1) if total > 0 else 0
+
+def compute_hunt_stats(hunt_id=None):
+    # Whole deployment, or a single hunt when hunt_id is given. The queries
+    # below are index scans, which still visit one index entry per counted
+    # row, rather than full table scans.
+    catalog = get_step_catalog()
+    hunts = list(catalog.hunts.values())
+    if hunt_id is not None:
+        hunts = [hunt for hunt in hunts if hunt.id == hunt_id]
+    steps = [step for hunt in hunts for step in hunt.steps]
+    step_ids = [step.id for step in steps]
+    
+    # Enrolled users per hunt, from ix_users_hunt
+    enrolled = db.session.query(User.hunt_id, func.count()).group_by(User.hunt_id)
+    scans = db.session.query(func.count()).select_from(ScanEvent)
+    if hunt_id is not None:
+        enrolled = enrolled.filter(User.hunt_id == hunt_id)
+        scans = scans.filter(ScanEvent.step_id.in_(step_ids))
+    enrolled = dict(enrolled.all())
+    total_users = sum(enrolled.values())
+    
+    # Scan totals; successful scans are counted through ix_scan_events_success
+    total_scans = scans.scalar()
+    successful_scans = scans.filter(ScanEvent.success == True).scalar()
+    
+    # Per-step completed/revealed counts from ix_user_step_progress_step;
+    # COUNT(col) skips the NULL timestamps
+    per_step = {
+        step_id: (completed_count, revealed_count)
+        for step_id, completed_count, revealed_count in db.session.query(
+            UserStepProgress.step_id,
+            func.count(UserStepProgress.completed_at),
+            func.count(UserStepProgress.revealed_at)
+        ).filter(UserStepProgress.step_id.in_(step_ids)).group_by(UserStepProgress.step_id)
+    }
+    
+    # Steps are only completed in order and enrolling clears progress, so
+    # whoever completed a hunt's last step has finished that hunt
+    completed_users = sum(per_step.get(hunt.steps[-1].id, (0, 0))[0] for hunt in hunts if hunt.steps)
+    
+    step_stats = []
+    for step in steps:
+        completed_count, revealed_count = per_step.get(step.id, (0, 0))
+        step_stats.append({
+            'step_id': step.id,
+            'hunt_id': step.hunt_id,
+            'position': step.position,
+            'step_name': step.name,
+            'completed_count': completed_count,
+            'revealed_count': revealed_count,
+            # Share of the players enrolled in this step's hunt
+            'completion_rate': _rate(completed_count, enrolled.get(step.hunt_id, 0))
+        })
+    
+    return {
+        'total_users': total_users,
+        'total_scans': total_scans,
+        'successful_scans': successful_scans,
+        'completed_users': completed_users,
+        'completion_rate': _rate(completed_users, total_users),
+        'step_stats': step_stats
+    }
@@ -0,0 +1,202 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from src.models.database import db
+from src.models.scavenger_step import ScavengerStep
+from src.models.hunt import Hunt, HuntStep
+from src.models.cache_version import CacheVersion
+
+class CatalogStep(namedtuple('CatalogStep', ['id', 'hunt_id', 'position', 'name', 'clue', 'qr_code_url',
+                                             'qr_code_value', 'user_payload'])):
+    __slots__ = ()
+    
+    def to_dict_for_user(self):
+        # Precomputed when the snapshot is built; treat as read-only
+        return self.user_payload
+
+HuntRow = namedtuple('HuntRow', ['id', 'slug', 'name', 'city', 'is_active'])
+
+class CatalogHunt(namedtuple('CatalogHunt', ['id', 'slug', 'name', 'city', 'is_active', 'steps',
+                                             'position_of', 'fingerprint'])):
+    __slots__ = ()
+    
+    @property
+    def total_steps(self):
+        return len(self.steps)
+    
+    def positions(self, step_ids):
+        # Step ids -> positions in this hunt, dropping steps of other hunts
+        return [self.position_of[step_id] for step_id in step_ids if step_id in self.position_of]
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'slug': self.slug,
+            'name': self.name,
+            'city': self.city,
+            'total_steps': self.total_steps
+        }
+
+def _catalog_hunt(hunt, steps):
+    steps = tuple(sorted(steps, key=lambda step: step.position))
+    # Per-hunt content hash, so editing one hunt leaves the others' ETags alone
+    fingerprint = hashlib.blake2b(repr((hunt, steps)).encode(), digest_size=8).hexdigest()
+    return CatalogHunt(
+        id=hunt.id,
+        slug=hunt.slug,
+        name=hunt.name,
+        city=hunt.city,
+        is_active=hunt.is_active,
+        steps=steps,
+        position_of=MappingProxyType({step.id: step.position for step in steps}),
+        fingerprint=fingerprint
+    )
+
+class StepCatalog:
+    # Immutable snapshot of the hunts, hunt_steps and scavenger_steps tables.
+    # Lookups by (hunt_id, position) and (hunt_id, qr_code_value) are dict
+    # hits however many hunts are loaded.
+    
+    def __init__(self, version, steps, hunts=()):
+        self.version = version
+        self.steps = tuple(sorted(steps, key=lambda step: step.id))
+        self.by_id = MappingProxyType({step.id: step for step in self.steps})
+        placed = [step for step in self.steps if step.hunt_id is not None]
+        self.by_position = MappingProxyType({(step.hunt_id, step.position): step for step in placed})
+        self.by_qr_code = MappingProxyType({(step.hunt_id, step.qr_code_value): step for step in placed})
+        steps_by_hunt = {}
+        for step in placed:
+            steps_by_hunt.setdefault(step.hunt_id, []).append(step)
+        self.hunts = MappingProxyType({
+            hunt.id: _catalog_hunt(hunt, steps_by_hunt.get(hunt.id, ()))
+            for hunt in sorted(hunts, key=lambda hunt: hunt.id)
+        })
+        # Content hash, stable across processes and restarts (unlike version)
+        self.fingerprint = hashlib.blake2b(repr((self.steps, tuple(self.hunts.values()))).encode(),
+                                           digest_size=8).hexdigest()
+    
+    def __len__(self):
+        return len(self.steps)
+    
+    def get(self, step_id):
+        return self.by_id.get(step_id)
+    
+    def get_hunt(self, hunt_id):
+        return self.hunts.get(hunt_id)
+    
+    def active_hunts(self):
+        return [hunt for hunt in self.hunts.values() if hunt.is_active]
+    
+    def step_at(self, hunt_id, position):
+        return self.by_position.get((hunt_id, position))
+    
+    def find_by_qr_code(self, hunt_id, qr_code_value):
+        return self.by_qr_code.get((hunt_id, qr_code_value))
+    
+    def total_steps(self, hunt_id):
+        hunt = self.hunts.get(hunt_id)
+        return hunt.total_steps if hunt else 0
+
+# Row in cache_versions shared by all worker processes
+CATALOG_VERSION = 'step_catalog'
+
+_lock = threading.Lock()
+_version = None
+_checked_at = None
+_check_interval = 1.0
+_catalog = None
+
+def configure_step_catalog(config):
+    global _check_interval
+    _check_interval = config.get('STEP_CATALOG_CHECK_INTERVAL', 1.0)
+
+def _read_version():
+    return db.session.query(CacheVersion.version).filter(CacheVersion.name == CATALOG_VERSION).scalar() or 0
+
+def _bump_version():
+    # Returns the new shared version; commits
+    bump = update(CacheVersion).where(CacheVersion.name == CATALOG_VERSION).values(version=CacheVersion.version + 1)
+    if db.session.execute(bump).rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.add(CacheVersion(CATALOG_VERSION, 1))
+        except IntegrityError:
+            # Another process created the row first
+            db.session.execute(bump)
+    version = _read_version()
+    db.session.commit()
+    return version
+
+def _current(catalog, now):
+    return (catalog is not None and catalog.version == _version
+            and _checked_at is not None and now < _checked_at + _check_interval)
+
+def _load(version):
+    hunts = [HuntRow(hunt.id, hunt.slug, hunt.name, hunt.city, hunt.is_active) for hunt in Hunt.query.all()]
+    placements = {
+        row.step_id: (row.hunt_id, row.position)
+        for row in HuntStep.query.with_entities(HuntStep.step_id, HuntStep.hunt_id, HuntStep.position)
+    }
+    steps = []
+    for step in ScavengerStep.query.all():
+        hunt_id, position = placements.get(step.id, (None, None))
+        steps.append(CatalogStep(
+            id=step.id,
+            hunt_id=hunt_id,
+            position=position,
+            name=step.name,
+            clue=step.clue,
+            qr_code_url=step.qr_code_url,
+            qr_code_value=step.qr_code_value,
+            user_payload=step.to_dict_for_user()
+        ))
+    return StepCatalog(version, steps, hunts)
+
+def get_step_catalog():
+    global _catalog, _version, _checked_at
+    # Lock-free fast path. The shared version is read at most every
+    # check interval, and the snapshot only rebuilt when it changed.
+    catalog = _catalog
+    if _current(catalog, time.monotonic()):
+        return catalog
+    
+    with _lock:
+        now = time.monotonic()
+        if _checked_at is None or now >= _checked_at + _check_interval:
+            _version = _read_version()
+            _checked_at = now
+        if _catalog is None or _catalog.version != _version:
+            _catalog = _load(_version)
+        return _catalog
+
+def peek_step_catalog():
+    # The current snapshot without touching the database, or None if it
+    # needs a (re)load; for callers that cannot block on a query
+    catalog = _catalog
+    if _current(catalog, time.monotonic()):
+        return catalog
+    return None
+
+def invalidate_step_catalog():
+    # Called after committing any write to hunts, hunt_steps or
+    # scavenger_steps. This process reloads on its next lookup, the other
+    # worker processes once their next version check sees the bump.
+    global _version, _checked_at
+    with _lock:
+        _version = _bump_version()
+        _checked_at = time.monotonic()
+
+def parse_hunt_id(value):
+    # Hunt ids from request bodies: JSON integers or digit strings. Booleans
+    # (JSON true is an int in Python) and fractions are rejected with None.
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import pytest
+
+# The tests run once per database backend. SQLite always runs, on a
+# temporary file; PostgreSQL and MySQL run when these variables hold the URL
+# of an empty database the tests may drop and recreate tables in.
+BACKENDS = {
+    'sqlite': None,
+    'postgresql': 'TEST_POSTGRESQL_URL',
+    'mysql': 'TEST_MYSQL_URL'
+}
+
+_tmp = tempfile.mkdtemp(prefix='scavenger-hunt-tests-')
+
+# create_app() reads its configuration from the environment, and importing
+# src.main builds the module-level app, so keep it away from instance/
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'import.db')}"
+os.environ['AUTO_BOOTSTRAP'] = 'false'
+os.environ['SCAN_EVENT_WRITE_MODE'] = 'sync'
+os.environ['DB_STATEMENT_TIMEOUT_MS'] = '5000'
+
+from src.main import create_app
+from src.models.database import db, database_uri
+from src.services.bootstrap import bootstrap_database, DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD
+from src.services.step_catalog import invalidate_step_catalog
+from src.services.auth_cache import token_cache, principal_cache
+from src.services.progress_cache import progress_cache
+
+@pytest.fixture(scope='session', params=list(BACKENDS))
+def app(request):
+    variable = BACKENDS[request.param]
+    if variable is None:
+        url = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+    else:
+        url = os.environ.get(variable)
+        if not url:
+            pytest.skip(f'{variable} is not set')
+    os.environ['DATABASE_URL'] = database_uri({'DATABASE_URL': url})
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    # Every test starts from freshly bootstrapped tables and empty caches.
+    # cache_versions is kept, as in a real deployment its counters only grow.
+    with app.app_context():
+        db.metadata.drop_all(db.engine, tables=[
+            table for table in db.metadata.sorted_tables if table.name != 'cache_versions'
+        ])
+        bootstrap_database()
+        invalidate_step_catalog()
+        db.session.remove()
+    token_cache.clear()
+    principal_cache.clear()
+    progress_cache.clear()
+    return app.test_client()
+
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def login(client):
+    def login(email=None, phone=None, **extra):
+        response = client.post('/api/auth/login', json=dict(extra, email=email, phone=phone))
+        assert response.status_code == 200, response.get_json()
+        return auth(response.get_json()['token'])
+    return login
+
+@pytest.fixture
+def admin(client):
+    response = client.post('/api/auth/admin-login', json={
+        'username': DEFAULT_ADMIN_USERNAME,
+        'password': DEFAULT_ADMIN_PASSWORD
+    })
+    assert response.status_code == 200
+    return auth(response.get_json()['token'])
@@ -0,0 +1,51 @@
+import datetime
+import pytest
+from src.models.cache_eviction import CacheEviction
+from src.models.database import db
+from src.models.user import User
+from src.services.auth_cache import PrincipalCache
+
+@pytest.fixture
+def user_id(client, login):
+    return client.get('/api/auth/me', headers=login('ada@example.com')).get_json()['user']['id']
+
+def record_eviction(record_id, key, seconds_ago=0):
+    # As inserted by another process; ids from a sequence may commit out of order
+    record = CacheEviction('User', key)
+    record.id = record_id
+    record.created_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds_ago)
+    db.session.add(record)
+    db.session.commit()
+
+def test_eviction_during_a_miss_is_not_lost(app, user_id):
+    # No sync between the loads: only the local eviction can drop the entry
+    cache = PrincipalCache(ttl=60, sync_interval=60)
+    snapshot = PrincipalCache._snapshot
+    
+    def evicted_meanwhile(obj):
+        # Another request commits a change and evicts after this one read the row
+        cache.evict(User, obj.id)
+        return snapshot(obj)
+    
+    with app.app_context():
+        cache._snapshot = evicted_meanwhile
+        cache.load(User, user_id)
+        del cache._snapshot
+        cache.load(User, user_id)
+        cache.load(User, user_id)
+    assert (cache.misses, cache.hits) == (2, 1)
+
+def test_sync_applies_records_that_commit_late(app, user_id):
+    cache = PrincipalCache(ttl=60, sync_interval=0)
+    with app.app_context():
+        cache.load(User, user_id)
+        record_eviction(100, 'someone-else')
+        cache.load(User, user_id)
+        assert cache.hits == 1
+        
+        # A lower id committing after the sync above still applies
+        record_eviction(50, user_id, seconds_ago=1)
+        cache.load(User, user_id)
+        assert cache.misses == 2
+        cache.load(User, user_id)
+        assert cache.hits == 2
@@ -0,0 +1,16 @@
+import json
+from src.services.compression import json_compression
+
+def json_response(app, etag, weak):
+    response = app.response_class(json.dumps({'clue': 'x' * 2000}), mimetype='application/json')
+    response.set_etag(etag, weak=weak)
+    return response
+
+def test_only_weakly_validated_json_is_compressed(app):
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip'}):
+        # Static .json files: one strong ETag must not cover two encodings
+        static = json_compression.compress_response(json_response(app, 'manifest', weak=False))
+        assert 'Content-Encoding' not in static.headers
+        
+        api = json_compression.compress_response(json_response(app, 'progress', weak=True))
+        assert api.headers['Content-Encoding'] == 'gzip'
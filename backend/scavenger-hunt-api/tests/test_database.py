@@ -0,0 +1,49 @@
+import datetime
+import pytest
+from sqlalchemy import text
+from src.models.database import db, database_uri
+from src.models.user import User
+from src.routes.auth import upsert_login_user
+
+def test_database_uri_normalises_provider_urls():
+    assert database_uri({}) == 'sqlite:///scavenger_hunt.db'
+    assert database_uri({'DATABASE_URL': 'postgres://u:p@db/hunt'}) == 'postgresql://u:p@db/hunt'
+    assert database_uri({'DATABASE_URL': 'mysql://u:p@db/hunt'}) == 'mysql+pymysql://u:p@db/hunt'
+
+def test_login_upsert_creates_then_touches_the_user(app, client):
+    with app.app_context():
+        first = upsert_login_user('email', 'ada@example.com')
+        db.session.commit()
+        first_id, first_active = first.id, first.last_active
+        
+        again = upsert_login_user('email', 'ada@example.com')
+        db.session.commit()
+        assert again.id == first_id and again.last_active >= first_active
+        
+        by_phone = upsert_login_user('phone', '+15550100')
+        db.session.commit()
+        assert by_phone.id != first_id and by_phone.current_step == 1
+        assert User.query.count() == 2
+
+def test_timestamps_keep_microseconds(app, client):
+    # DATETIME(6) on MySQL; event ordering and the keyset cursors rely on it
+    stamp = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456)
+    with app.app_context():
+        user_id = upsert_login_user('email', 'ada@example.com').id
+        db.session.commit()
+        db.session.get(User, user_id).last_active = stamp
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(User, user_id).last_active == stamp
+
+def test_statement_timeout(app, client):
+    with app.app_context():
+        backend = db.engine.dialect.name
+        statement_timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+        if backend == 'mysql':
+            timeout = db.session.execute(text('SELECT @@SESSION.max_execution_time')).scalar()
+            assert int(timeout) == statement_timeout
+        elif backend == 'postgresql':
+            assert db.session.execute(text('SHOW statement_timeout')).scalar() == f'{statement_timeout // 1000}s'
+        else:
+            pytest.skip('SQLite has no statement timeout')
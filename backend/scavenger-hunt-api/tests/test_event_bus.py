@@ -0,0 +1,30 @@
+from src.services.event_bus import Broadcaster
+
+def publish(broadcaster, count):
+    return [broadcaster.publish('scan', {'index': index}) for index in range(count)]
+
+def test_resume_replays_more_than_the_client_buffer():
+    broadcaster = Broadcaster(history=1000, client_buffer=256)
+    publish(broadcaster, 300)
+    
+    subscription = broadcaster.subscribe(last_event_id=10)
+    assert not subscription.dropped
+    assert [event.id for event in subscription.wait(timeout=0)] == list(range(11, 301))
+    
+    # Live events count against the buffer again once the replay is drained
+    publish(broadcaster, 256)
+    assert not subscription.dropped
+    assert len(subscription.wait(timeout=0)) == 256
+
+def test_dropped_client_resumes_from_the_newest_event():
+    broadcaster = Broadcaster(history=1000, client_buffer=4)
+    subscription = broadcaster.subscribe()
+    newest = publish(broadcaster, 10)[-1]
+    
+    assert subscription.dropped and subscription.wait(timeout=0) == []
+    assert subscription.last_id == newest.id
+    
+    resumed = broadcaster.subscribe(last_event_id=subscription.last_id)
+    broadcaster.publish('scan', {})
+    assert not resumed.dropped
+    assert [event.id for event in resumed.wait(timeout=0)] == [newest.id + 1]
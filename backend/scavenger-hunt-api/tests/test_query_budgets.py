@@ -0,0 +1,65 @@
+import pytest
+from src.services.sql_profiler import query_budget
+from test_routes import QR_CODES, scan
+
+# Statement budgets per request, independent of how many users and events
+# exist. Any request may also run the periodic step catalog version and
+# principal cache eviction checks, hence the slack.
+SLACK = 2
+PLAYERS = 6
+
+@pytest.fixture
+def players(client, login):
+    # More users and events than any budget, so a query per row shows up
+    players = []
+    for index in range(PLAYERS):
+        player = login(f'player{index}@example.com')
+        for qr_value in QR_CODES[:index % len(QR_CODES)]:
+            scan(client, player, qr_value)
+        scan(client, player, 'NOT_A_CODE')
+        players.append(player)
+    return players
+
+def within_budget(app, budget, request):
+    with app.app_context(), query_budget(budget + SLACK, max_repeats=1):
+        response = request()
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def test_admin_users(app, client, admin, players):
+    page = within_budget(app, 5, lambda: client.get('/api/admin/users?limit=4', headers=admin))
+    assert len(page['users']) == 4
+    rest = within_budget(app, 5, lambda: client.get(f"/api/admin/users?cursor={page['next_cursor']}",
+                                                    headers=admin))
+    assert len(rest['users']) == PLAYERS - 4
+
+@pytest.mark.parametrize('query', ['', '?success_only=true', '?step_id=1'])
+def test_admin_events(app, client, admin, players, query):
+    events = within_budget(app, 3, lambda: client.get(f'/api/admin/events{query}', headers=admin))['events']
+    assert events and all(event['user_email'] for event in events)
+
+def test_admin_stats(app, client, admin, players):
+    stats = within_budget(app, 5, lambda: client.get('/api/admin/stats', headers=admin))
+    assert stats['total_users'] == PLAYERS and len(stats['step_stats']) == len(QR_CODES)
+
+def test_scan_qr(app, client, players):
+    player = players[1]
+    # Advancing inserts the event, moves the user on and records the progress row
+    advanced = within_budget(app, 8, lambda: client.post('/api/hunt/scan-qr', json={'qr_value': QR_CODES[1]},
+                                                          headers=player))
+    assert advanced['advanced']
+    retried = within_budget(app, 2, lambda: client.post('/api/hunt/scan-qr', json={'qr_value': QR_CODES[1]},
+                                                         headers=player))
+    assert retried['success'] and not retried['advanced']
+    wrong = within_budget(app, 3, lambda: client.post('/api/hunt/scan-qr', json={'qr_value': 'NOT_A_CODE'},
+                                                       headers=player))
+    assert not wrong['success']
+
+def test_progress(app, client, players):
+    player = players[-1]
+    progress = within_budget(app, 2, lambda: client.get('/api/hunt/progress', headers=player))
+    assert len(progress['steps']) == len(QR_CODES)
+    # The progress cache serves the body the second time; the remaining
+    # statement is the user lookup, as the test app runs without a principal
+    # cache (PRINCIPAL_CACHE_TTL=0)
+    within_budget(app, 1, lambda: client.get('/api/hunt/progress', headers=player))
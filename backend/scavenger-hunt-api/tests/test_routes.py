@@ -0,0 +1,260 @@
+from datetime import datetime
+from sqlalchemy import insert
+from src.models.database import db
+from src.models.user import User
+from src.models.user_step_progress import UserStepProgress
+from src.routes import hunt as hunt_routes
+from src.services.bootstrap import DEFAULT_STEPS
+from src.services.scan_writer import scan_event_writer
+
+QR_CODES = [step['qr_code_value'] for step in DEFAULT_STEPS]
+
+def scan(client, headers, qr_value):
+    response = client.post('/api/hunt/scan-qr', json={'qr_value': qr_value}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+def events(client, admin, query=''):
+    response = client.get(f'/api/admin/events{query}', headers=admin)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['events']
+
+def test_login_creates_each_user_once(client, login):
+    first = client.post('/api/auth/login', json={'email': 'ada@example.com'}).get_json()['user']
+    again = client.post('/api/auth/login', json={'email': 'ada@example.com'}).get_json()['user']
+    by_phone = client.post('/api/auth/login', json={'phone': '+15550100'}).get_json()['user']
+    
+    assert first['id'] == again['id']
+    assert first['current_step'] == 1 and first['completed_steps'] == []
+    assert by_phone['id'] != first['id'] and by_phone['phone'] == '+15550100'
+    assert client.post('/api/auth/login', json={}).status_code == 400
+    assert client.post('/api/auth/login', json={'email': 'x@example.com', 'hunt_id': 999}).status_code == 404
+    
+    me = client.get('/api/auth/me', headers=login('ada@example.com')).get_json()['user']
+    assert me['id'] == first['id']
+
+def test_admin_login(client):
+    wrong = client.post('/api/auth/admin-login', json={'username': 'admin', 'password': 'nope'})
+    assert wrong.status_code == 401
+
+def test_routes_require_the_right_token(client, login, admin):
+    player = login('ada@example.com')
+    assert client.get('/api/hunt/progress').status_code == 401
+    assert client.get('/api/hunt/progress', headers=admin).status_code == 401
+    assert client.get('/api/admin/stats', headers=player).status_code == 403
+
+def test_scan_advances_only_on_the_current_code(client, login):
+    player = login('ada@example.com')
+    
+    wrong = scan(client, player, QR_CODES[2])
+    assert wrong == {'success': False, 'message': 'Wrong location – try again!'}
+    
+    right = scan(client, player, QR_CODES[0])
+    assert right['success'] and right['advanced'] and not right['completed_hunt']
+    assert right['next_step']['id'] == DEFAULT_STEPS[1]['id']
+    
+    current = client.get('/api/hunt/current-step', headers=player).get_json()
+    assert current['step']['id'] == DEFAULT_STEPS[1]['id']
+    assert current['progress']['current'] == 2
+    assert current['progress']['completed_steps'] == [1]
+
+def test_retried_scan_is_idempotent(client, login, admin):
+    player = login('ada@example.com')
+    scan(client, player, QR_CODES[0])
+    
+    retry = scan(client, player, QR_CODES[0])
+    assert retry['success'] and not retry['advanced']
+    assert retry['next_step']['id'] == DEFAULT_STEPS[1]['id']
+    
+    progress = client.get('/api/hunt/progress', headers=player).get_json()
+    assert progress['current_step'] == 2 and progress['completed_count'] == 1
+    assert [event['success'] for event in events(client, admin)] == [True]
+
+def test_async_scan_event_waits_for_the_commit(client, login, admin, monkeypatch):
+    monkeypatch.setattr(scan_event_writer, 'mode', 'async')
+    player = login('ada@example.com')
+    advance_step = hunt_routes.advance_step
+    
+    def failing(*args):
+        raise RuntimeError('database went away')
+    
+    monkeypatch.setattr(hunt_routes, 'advance_step', failing)
+    response = client.post('/api/hunt/scan-qr', json={'qr_value': QR_CODES[0]}, headers=player)
+    assert response.status_code == 500
+    
+    monkeypatch.setattr(hunt_routes, 'advance_step', advance_step)
+    assert scan(client, player, QR_CODES[0])['advanced']
+    scan_event_writer.flush()
+    assert [event['success'] for event in events(client, admin)] == [True]
+
+def test_reveal_location(client, login, admin):
+    player = login('ada@example.com')
+    
+    response = client.post('/api/hunt/reveal-location', headers=player)
+    assert response.status_code == 200
+    assert response.get_json()['location'] == DEFAULT_STEPS[0]['name']
+    # Revealing again is harmless
+    assert client.post('/api/hunt/reveal-location', headers=player).get_json()['revealed']
+    
+    progress = client.get('/api/hunt/progress', headers=player).get_json()
+    assert progress['steps'][0]['revealed'] and not progress['steps'][0]['completed']
+    
+    scan(client, player, QR_CODES[0])
+    progress = client.get('/api/hunt/progress', headers=player).get_json()
+    assert progress['steps'][0]['revealed'] and progress['steps'][0]['completed']
+    assert events(client, admin)[0]['revealed_first'] is True
+
+def test_reveal_racing_a_scan_keeps_the_reveal(client, login, monkeypatch):
+    player = login('ada@example.com')
+    add_revealed_location = User.add_revealed_location
+    
+    def racing(user, step_id):
+        # A scan of the same step commits its progress row after this request
+        # loaded the user's progress but before the reveal is flushed
+        user.progress
+        with db.engine.begin() as connection:
+            connection.execute(insert(UserStepProgress).values(user_id=user.id, step_id=step_id,
+                                                                completed_at=datetime.utcnow()))
+        add_revealed_location(user, step_id)
+    
+    monkeypatch.setattr(User, 'add_revealed_location', racing)
+    response = client.post('/api/hunt/reveal-location', headers=player)
+    assert response.status_code == 200, response.get_json()
+    
+    progress = client.get('/api/hunt/progress', headers=player).get_json()
+    assert progress['steps'][0]['revealed'] and progress['steps'][0]['completed']
+
+def test_progress_revalidates_with_etag(client, login):
+    player = login('ada@example.com')
+    
+    first = client.get('/api/hunt/progress', headers=player)
+    etag = first.headers['ETag']
+    unchanged = client.get('/api/hunt/progress', headers=dict(player, **{'If-None-Match': etag}))
+    assert unchanged.status_code == 304
+    
+    scan(client, player, QR_CODES[0])
+    changed = client.get('/api/hunt/progress', headers=dict(player, **{'If-None-Match': etag}))
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.get_json()['current_step'] == 2
+
+def test_complete_the_hunt(client, login, admin):
+    player = login('ada@example.com')
+    login('bob@example.com')
+    
+    for qr_value in QR_CODES[:-1]:
+        assert scan(client, player, qr_value)['advanced']
+    last = scan(client, player, QR_CODES[-1])
+    assert last['advanced'] and last['completed_hunt']
+    
+    current = client.get('/api/hunt/current-step', headers=player).get_json()
+    assert current['completed'] is True
+    
+    stats = client.get('/api/admin/stats', headers=admin).get_json()
+    assert stats['total_users'] == 2
+    assert stats['completed_users'] == 1 and stats['completion_rate'] == 50.0
+    assert stats['total_scans'] == stats['successful_scans'] == len(QR_CODES)
+    assert all(step['completed_count'] == 1 for step in stats['step_stats'])
+
+def test_admin_users_pages_newest_first(client, login, admin):
+    emails = [f'player{index}@example.com' for index in range(5)]
+    for email in emails:
+        login(email)
+    
+    seen, cursor = [], None
+    while True:
+        query = f'?limit=2&cursor={cursor}' if cursor else '?limit=2'
+        page = client.get(f'/api/admin/users{query}', headers=admin).get_json()
+        assert len(page['users']) <= 2
+        seen.extend(user['email'] for user in page['users'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == emails[::-1]
+    
+    assert client.get('/api/admin/users?cursor=garbage', headers=admin).status_code == 400
+
+def test_admin_events_filters_and_pages(client, login, admin):
+    ada = login('ada@example.com')
+    bob = login('bob@example.com')
+    scan(client, ada, QR_CODES[0])
+    scan(client, ada, 'NOT_A_CODE')
+    scan(client, bob, QR_CODES[0])
+    
+    all_events = events(client, admin)
+    assert len(all_events) == 3
+    assert all_events[0]['user_email'] == 'bob@example.com'
+    assert all_events[0]['step_name'] == DEFAULT_STEPS[0]['name']
+    
+    ada_id = all_events[-1]['user_id']
+    assert len(events(client, admin, f'?user_id={ada_id}')) == 2
+    assert len(events(client, admin, '?success_only=true')) == 2
+    assert events(client, admin, f"?since={all_events[1]['scanned_at']}") == all_events[:1]
+    
+    first = client.get('/api/admin/events?limit=2', headers=admin).get_json()
+    rest = events(client, admin, f"?limit=2&cursor={first['next_cursor']}")
+    assert first['events'] + rest == all_events
+
+def test_admin_skip_and_reset(app, client, login, admin):
+    player = login('ada@example.com')
+    user_id = client.get('/api/auth/me', headers=player).get_json()['user']['id']
+    
+    def progress_version():
+        with app.app_context():
+            return db.session.get(User, user_id).progress_version
+    
+    before = progress_version()
+    skipped = client.post(f'/api/admin/user/{user_id}/skip-step', headers=admin)
+    assert skipped.status_code == 200
+    assert skipped.get_json()['user']['current_step'] == 2
+    assert progress_version() == before + 1
+    assert client.get('/api/hunt/progress', headers=player).get_json()['completed_count'] == 1
+    
+    reset = client.post(f'/api/admin/user/{user_id}/reset', headers=admin)
+    assert reset.status_code == 200
+    progress = client.get('/api/hunt/progress', headers=player).get_json()
+    assert progress['current_step'] == 1 and progress['completed_count'] == 0
+    
+    assert client.post('/api/admin/user/missing/reset', headers=admin).status_code == 404
+
+def test_admin_changes_a_qr_code(client, login, admin):
+    player = login('ada@example.com')
+    step_id = DEFAULT_STEPS[0]['id']
+    
+    response = client.put(f'/api/admin/steps/{step_id}', json={'qr_code_value': 'MOVED_001'}, headers=admin)
+    assert response.status_code == 200
+    
+    assert not scan(client, player, QR_CODES[0])['success']
+    assert scan(client, player, 'MOVED_001')['advanced']
+
+def test_create_hunt_and_enroll(client, login, admin):
+    steps = [
+        {'name': 'Pier', 'clue': 'Where the boats rest', 'qr_code_value': 'PIER_001'},
+        {'name': 'Park', 'clue': 'Green and wide', 'qr_code_value': 'PARK_002'}
+    ]
+    created = client.post('/api/admin/hunts', json={'slug': 'harbor', 'name': 'Harbor Hunt', 'steps': steps},
+                          headers=admin)
+    assert created.status_code == 201
+    hunt_id = created.get_json()['hunt']['id']
+    duplicate = client.post('/api/admin/hunts', json={'slug': 'harbor', 'name': 'Again', 'steps': steps},
+                            headers=admin)
+    assert duplicate.status_code == 409
+    
+    listed = client.get('/api/hunt/hunts').get_json()['hunts']
+    assert {'harbor', 'milwaukee'} <= {hunt['slug'] for hunt in listed}
+    
+    # Numeric strings are fine, booleans are not
+    assert login('bob@example.com', hunt_id=str(hunt_id))
+    assert client.post('/api/auth/login', json={'email': 'eve@example.com', 'hunt_id': True}).status_code == 400
+    
+    player = login('ada@example.com')
+    assert client.post('/api/hunt/enroll', json={'hunt_id': True}, headers=player).status_code == 400
+    assert client.post('/api/hunt/enroll', json={'hunt_id': hunt_id}, headers=player).status_code == 200
+    # Codes of the other hunt do not count
+    assert not scan(client, player, QR_CODES[0])['success']
+    assert scan(client, player, 'PIER_001')['advanced']
+    assert scan(client, player, 'PARK_002')['completed_hunt']
+    
+    stats = client.get(f'/api/admin/stats?hunt_id={hunt_id}', headers=admin).get_json()
+    assert stats['total_users'] == 2 and stats['completed_users'] == 1
+    assert [step['completion_rate'] for step in stats['step_stats']] == [50.0, 50.0]
+    assert client.get('/api/admin/stats?hunt_id=999', headers=admin).status_code == 404
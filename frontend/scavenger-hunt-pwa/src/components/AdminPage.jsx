@@ -9,6 +9,8 @@ import { useAuth } from '../hooks/useAuth'
 export function AdminPage() {
   const { admin, logout, apiCall } = useAuth()
   const [users, setUsers] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [stats, setStats] = useState(null)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState('')
@@ -26,6 +28,7 @@ export function AdminPage() {
         apiCall('/admin/stats')
       ])
       setUsers(usersData.users)
+      setNextCursor(usersData.next_cursor)
       setStats(statsData)
     } catch (error) {
       setError('Failed to load admin data')
@@ -34,6 +37,20 @@ export function AdminPage() {
     }
   }
 
+  // The users list is paginated; fetch the page after the last one shown
+  const loadMoreUsers = async () => {
+    try {
+      setLoadingMore(true)
+      const usersData = await apiCall(`/admin/users?cursor=${encodeURIComponent(nextCursor)}`)
+      setUsers((current) => [...current, ...usersData.users])
+      setNextCursor(usersData.next_cursor)
+    } catch (error) {
+      setError('Failed to load more users')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const resetUserProgress = async (userId) => {
     try {
       await apiCall(`/admin/user/${userId}/reset`, { method: 'POST' })
@@ -167,12 +184,12 @@ export function AdminPage() {
                       <div>
                         <p className="font-medium">{user.email || user.phone}</p>
                         <p className="text-sm text-gray-500">
-                          Step {user.current_step} of 13 • {user.progress_percentage}% complete
+                          Step {user.current_step} of {user.total_steps} • {user.progress_percentage}% complete
                         </p>
                       </div>
                       <div className="flex space-x-2">
-                        <Badge variant={user.completed_count === 13 ? "default" : "secondary"}>
-                          {user.completed_count}/13 completed
+                        <Badge variant={user.completed_count === user.total_steps ? "default" : "secondary"}>
+                          {user.completed_count}/{user.total_steps} completed
                         </Badge>
                         {user.revealed_count > 0 && (
                           <Badge variant="outline">
@@ -188,7 +205,7 @@ export function AdminPage() {
                       onClick={() => skipUserStep(user.id)}
                       variant="outline"
                       size="sm"
-                      disabled={user.completed_count >= 13}
+                      disabled={user.completed_count >= user.total_steps}
                     >
                       <SkipForward className="h-4 w-4 mr-1" />
                       Skip Step
@@ -210,6 +227,14 @@ export function AdminPage() {
                   No users have started the hunt yet.
                 </div>
               )}
+
+              {nextCursor && (
+                <div className="text-center">
+                  <Button onClick={loadMoreUsers} variant="outline" disabled={loadingMore}>
+                    {loadingMore ? 'Loading...' : 'Load more users'}
+                  </Button>
+                </div>
+              )}
             </div>
           </CardContent>
         </Card>